@@ -2,175 +2,564 @@
 Adaptive model selection and caching system for improved AI performance.
 """
 
-from dataclasses import dataclass
+from array import array
+from collections.abc import MutableMapping
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple
+from time import monotonic, time
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Set, Tuple
 from pathlib import Path
-import json
-import numpy as np
-from ravenxterm.model_registry import ModelMetadata, ModelType
+import atexit
+import heapq
+import logging
+import mmap
+import os
+import weakref
+from ravenxterm import serialization
+from ravenxterm.model_registry import REGISTRY_CACHE_FILENAME, ModelMetadata, ModelType
 from ravenxterm.user_preferences import UserPreferences, PerformancePreference, AccuracyPreference
 
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Candidate lists larger than this are scored with numpy; smaller ones are
+# scored in pure Python so the numpy import is only paid when it helps
+VECTORIZE_THRESHOLD = 32
+# Pending stats are written at most this often, or every N-th use of a model
+STATS_FLUSH_INTERVAL = 5.0  # seconds
+STATS_FLUSH_EVERY = 50
+# The stats log is compacted once it grows past twice its compacted size
+STATS_COMPACT_MIN_BYTES = 64 * 1024
+
+# Selectors whose pending stats are flushed at exit; weak, so selectors can still be collected
+_open_selectors: 'weakref.WeakSet[AdaptiveModelSelector]' = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_open_selectors():
+    """Save the pending stats of every selector still alive at interpreter exit"""
+    for selector in list(_open_selectors):
+        selector.flush()
+
+
 @dataclass
 class ModelUsageStats:
-    """Statistics for model usage and performance"""
-    success_rate: float
-    avg_latency: float
-    avg_throughput: float
-    memory_efficiency: float
-    last_used: datetime
-    total_uses: int
+    """Statistics for model usage and performance
+
+    Running sums are stored so recording a use is a few additions; the
+    averages are derived on read.
+    """
+    sum_success: float = 0.0
+    sum_latency: float = 0.0
+    sum_throughput: float = 0.0
+    sum_memory_efficiency: float = 0.0
+    last_used: float = field(default_factory=time)  # Unix timestamp
+    total_uses: int = 0
+
+    def _mean(self, total: float) -> float:
+        """Average a running sum over all recorded uses"""
+        return total / self.total_uses if self.total_uses else 0.0
+
+    @property
+    def success_rate(self) -> float:
+        return self._mean(self.sum_success)
+
+    @property
+    def avg_latency(self) -> float:
+        return self._mean(self.sum_latency)
+
+    @property
+    def avg_throughput(self) -> float:
+        return self._mean(self.sum_throughput)
+
+    @property
+    def memory_efficiency(self) -> float:
+        return self._mean(self.sum_memory_efficiency)
+
+class ModelUsageTable(MutableMapping):
+    """Usage statistics for all models, stored as parallel packed columns
+
+    Behaves like a Dict[str, ModelUsageStats]; items are built from the
+    columns on access, so changes to them are not stored back. Use
+    record() to add a use of a model.
+    """
+
+    def __init__(self):
+        self._idx: Dict[str, int] = {}
+        self._names: List[str] = []
+        self.sum_success = array('d')
+        self.sum_latency = array('d')
+        self.sum_throughput = array('d')
+        self.sum_memory_efficiency = array('d')
+        self.last_used = array('d')  # Unix timestamps
+        self.total_uses = array('q')
+        # Bumped on every write so readers can tell when derived data is stale
+        self.version = 0
+
+    def _columns(self) -> Tuple[array, ...]:
+        """Get all per-model columns"""
+        return (self.sum_success, self.sum_latency, self.sum_throughput,
+                self.sum_memory_efficiency, self.last_used, self.total_uses)
+
+    def _append(self, name: str) -> int:
+        """Add an all-zero row for a model and return its index"""
+        i = self._idx[name] = len(self._names)
+        self._names.append(name)
+        for column in self._columns():
+            column.append(0)
+        return i
+
+    def __getitem__(self, name: str) -> ModelUsageStats:
+        i = self._idx[name]
+        return ModelUsageStats(
+            sum_success=self.sum_success[i],
+            sum_latency=self.sum_latency[i],
+            sum_throughput=self.sum_throughput[i],
+            sum_memory_efficiency=self.sum_memory_efficiency[i],
+            last_used=self.last_used[i],
+            total_uses=self.total_uses[i]
+        )
+
+    def __setitem__(self, name: str, stats: ModelUsageStats):
+        i = self._idx.get(name)
+        if i is None:
+            i = self._append(name)
+        self.sum_success[i] = stats.sum_success
+        self.sum_latency[i] = stats.sum_latency
+        self.sum_throughput[i] = stats.sum_throughput
+        self.sum_memory_efficiency[i] = stats.sum_memory_efficiency
+        self.last_used[i] = stats.last_used
+        self.total_uses[i] = stats.total_uses
+        self.version += 1
+
+    def __delitem__(self, name: str):
+        # Move the last row into the freed slot so the columns stay dense
+        i = self._idx.pop(name)
+        last_name = self._names.pop()
+        for column in self._columns():
+            last_value = column.pop()
+            if last_name != name:
+                column[i] = last_value
+        if last_name != name:
+            self._names[i] = last_name
+            self._idx[last_name] = i
+        self.version += 1
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._names)
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._idx
+
+    def index(self) -> Dict[str, int]:
+        """Get the row index of each model in the columns"""
+        return self._idx
+
+    def record(self, name: str, success: float, latency: float, throughput: float,
+               memory_efficiency: float, when: float) -> int:
+        """Add one use of a model to its running sums and return its total uses"""
+        i = self._idx.get(name)
+        if i is None:
+            i = self._append(name)
+        self.sum_success[i] += success
+        self.sum_latency[i] += latency
+        self.sum_throughput[i] += throughput
+        self.sum_memory_efficiency[i] += memory_efficiency
+        self.last_used[i] = when
+        self.total_uses[i] += 1
+        self.version += 1
+        return self.total_uses[i]
+
+    def averages(self, name: str) -> Optional[Tuple[float, float, float, float]]:
+        """Get a model's success rate, latency, throughput and memory efficiency averages"""
+        i = self._idx.get(name)
+        if i is None:
+            return None
+        uses = self.total_uses[i] or 1
+        return (self.sum_success[i] / uses, self.sum_latency[i] / uses,
+                self.sum_throughput[i] / uses, self.sum_memory_efficiency[i] / uses)
+
+    def names_by_age(self) -> List[str]:
+        """Get model names ordered from least to most recently used"""
+        return sorted(self._names, key=lambda name: self.last_used[self._idx[name]])
 
 class AdaptiveModelSelector:
     """Intelligent model selection and caching system"""
     
     def __init__(self, preferences: UserPreferences):
         self.preferences = preferences
-        self.usage_stats: Dict[str, ModelUsageStats] = {}
-        self.cache_dir = preferences.cache_dir
+        # Whether each quantization is heavy (Q4), keyed by the quantization tag so
+        # re-registering a model with another quantization needs no invalidation
+        self._q4_mask: Dict[Optional[str], bool] = {}
+        self._update_weights()
+        self._open_cache()
+        _open_selectors.add(self)
+
+    def _open_cache(self):
+        """Load usage statistics and cache bookkeeping from the preferred cache directory"""
+        self.usage_stats = ModelUsageTable()
+        self.cache_dir = self.preferences.cache_dir
         self.cache_dir.mkdir(parents=True, exist_ok=True)
+        # Parallel arrays of the usage stats used for vectorized scoring, rebuilt
+        # lazily once the table version moves past the one they were built from
+        self._stats_arrays: Optional[Tuple[Dict[str, int], 'np.ndarray', 'np.ndarray',
+                                           'np.ndarray', 'np.ndarray']] = None
+        self._stats_arrays_version = -1
+        self.stats_file = self.cache_dir / 'model_stats.jsonl'
+        self._dirty: set = set()  # Models with stats not yet written to the log
+        self._last_flush = monotonic()
+        self._compacted_size = 0
+        self._log_size = 0
+        # Set when the log may end in a partial line, so it is rewritten rather than appended to
+        self._log_torn = False
+        # Running total of the cache directory size for status queries. It only
+        # follows the selector's own writes; cleanup measures the directory itself
+        self._cache_bytes = self._measure_cache_size()
         self._load_stats()
 
+    def notify_preferences_changed(self, changed: Set[str]):
+        """Refresh state derived from preferences that were modified in place"""
+        self._update_weights()
+        if 'cache_dir' in changed:
+            self.flush()
+            self._open_cache()
+
+    @staticmethod
+    def _stats_from_dict(stats: Dict) -> ModelUsageStats:
+        """Create usage statistics from a dict as written to the stats log"""
+        total_uses = stats['total_uses']
+        if 'sum_latency' not in stats:
+            # Older stats files store averages rather than running sums
+            stats = {
+                'sum_success': stats['success_rate'] * total_uses,
+                'sum_latency': stats['avg_latency'] * total_uses,
+                'sum_throughput': stats['avg_throughput'] * total_uses,
+                'sum_memory_efficiency': stats['memory_efficiency'] * total_uses,
+                'last_used': stats['last_used'],
+            }
+        last_used = stats['last_used']
+        if isinstance(last_used, str):
+            # Older stats files store ISO timestamps
+            last_used = datetime.fromisoformat(last_used).timestamp()
+        return ModelUsageStats(
+            sum_success=stats['sum_success'],
+            sum_latency=stats['sum_latency'],
+            sum_throughput=stats['sum_throughput'],
+            sum_memory_efficiency=stats['sum_memory_efficiency'],
+            last_used=last_used,
+            total_uses=total_uses
+        )
+
     def _load_stats(self):
-        """Load usage statistics from cache"""
-        stats_file = self.cache_dir / 'model_stats.json'
-        if stats_file.exists():
-            try:
-                with open(stats_file, 'r') as f:
-                    data = json.load(f)
-                for model_name, stats in data.items():
-                    self.usage_stats[model_name] = ModelUsageStats(
-                        success_rate=stats['success_rate'],
-                        avg_latency=stats['avg_latency'],
-                        avg_throughput=stats['avg_throughput'],
-                        memory_efficiency=stats['memory_efficiency'],
-                        last_used=datetime.fromisoformat(stats['last_used']),
-                        total_uses=stats['total_uses']
-                    )
-            except Exception as e:
-                print(f"Error loading model stats: {e}")
+        """Load usage statistics from cache
+
+        The stats log holds one JSON line per update; the last line for a model wins.
+        """
+        legacy_file = self.cache_dir / 'model_stats.json'
+        if not self.stats_file.exists():
+            if legacy_file.exists():
+                self._load_legacy_stats(legacy_file)
+            return
+
+        try:
+            entries = 0
+            torn = False
+            size = self.stats_file.stat().st_size
+            if size:  # Empty files can't be memory-mapped
+                # Parse lines straight from the page cache rather than buffered copies
+                with open(self.stats_file, 'rb') as f, \
+                        mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    for line in iter(mm.readline, b''):
+                        try:
+                            entry = serialization.loads(line)
+                            self.usage_stats[entry['name']] = self._stats_from_dict(entry['stats'])
+                        except (ValueError, KeyError, TypeError):
+                            torn = True
+                            continue  # Skip lines torn by an interrupted write
+                        entries += 1
+                    torn = torn or mm[size - 1:size] != b'\n'
+            self._log_size = self._compacted_size = size
+            # Rewrite logs with duplicates, or with a torn line later appends would be merged into
+            if torn or entries > len(self.usage_stats):
+                self._compact_stats()
+        except (OSError, ValueError) as e:
+            logger.warning("Error loading model stats: %s", e)
+
+    def _load_legacy_stats(self, legacy_file: Path):
+        """Load usage statistics from the old single-document stats file"""
+        try:
+            with open(legacy_file, 'rb') as f:
+                data = serialization.loads(f.read())
+            for model_name, stats in data.items():
+                self.usage_stats[model_name] = self._stats_from_dict(stats)
+            self._compact_stats()
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning("Error loading model stats: %s", e)
 
     def _save_stats(self):
-        """Save usage statistics to cache"""
-        stats_file = self.cache_dir / 'model_stats.json'
+        """Append pending usage statistics to the stats log"""
+        if self._log_torn:
+            self._compact_stats()
+            return
         try:
-            data = {
-                name: {
-                    'success_rate': stats.success_rate,
-                    'avg_latency': stats.avg_latency,
-                    'avg_throughput': stats.avg_throughput,
-                    'memory_efficiency': stats.memory_efficiency,
-                    'last_used': stats.last_used.isoformat(),
-                    'total_uses': stats.total_uses
-                }
-                for name, stats in self.usage_stats.items()
+            lines = b''.join(
+                serialization.dumps({'name': name, 'stats': self.usage_stats[name]}) + b'\n'
+                for name in self._dirty
+                if name in self.usage_stats
+            )
+            with open(self.stats_file, 'ab') as f:
+                f.write(lines)
+            written = len(lines)
+            self._log_size += written
+            self._cache_bytes += written
+            self._dirty.clear()
+            self._last_flush = monotonic()
+            if self._log_size > 2 * max(self._compacted_size, STATS_COMPACT_MIN_BYTES):
+                self._compact_stats()
+        except OSError as e:
+            self._log_torn = True  # The append may have stopped part way through a line
+            logger.warning("Error saving model stats: %s", e)
+
+    def _compact_stats(self):
+        """Atomically rewrite the stats log with a single line per model"""
+        tmp_file = self.stats_file.with_suffix('.jsonl.tmp')
+        try:
+            with open(tmp_file, 'wb') as f:
+                for name, stats in self.usage_stats.items():
+                    f.write(serialization.dumps({'name': name, 'stats': stats}) + b'\n')
+            os.replace(tmp_file, self.stats_file)
+            compacted_size = self.stats_file.stat().st_size
+            self._cache_bytes += compacted_size - self._log_size
+            self._log_size = self._compacted_size = compacted_size
+            self._log_torn = False
+            self._dirty.clear()
+            self._last_flush = monotonic()
+        except OSError as e:
+            logger.warning("Error saving model stats: %s", e)
+
+    def export_stats(self, pretty: bool = False) -> bytes:
+        """Export all usage statistics as a single JSON document of per-model averages"""
+        return serialization.dumps({
+            name: {
+                'success_rate': stats.success_rate,
+                'avg_latency': stats.avg_latency,
+                'avg_throughput': stats.avg_throughput,
+                'memory_efficiency': stats.memory_efficiency,
+                'total_uses': stats.total_uses,
+                'last_used': datetime.fromtimestamp(stats.last_used),
             }
-            with open(stats_file, 'w') as f:
-                json.dump(data, f, indent=2)
-        except Exception as e:
-            print(f"Error saving model stats: {e}")
+            for name, stats in self.usage_stats.items()
+        }, pretty=pretty)
 
-    def calculate_model_score(self, model: ModelMetadata, task_type: str) -> float:
-        """Calculate a score for a model based on historical performance and task requirements"""
-        if model.name not in self.usage_stats:
-            return 0.5  # Default score for new models
-        
-        stats = self.usage_stats[model.name]
-        score = 0.0
-        
-        # Weight factors based on performance preference
+    def _get_stats_arrays(self) -> Tuple[Dict[str, int], 'np.ndarray', 'np.ndarray',
+                                         'np.ndarray', 'np.ndarray']:
+        """Get the usage stats as parallel arrays plus a name -> index map"""
+        import numpy as np
+
+        table = self.usage_stats
+        if self._stats_arrays is None or self._stats_arrays_version != table.version:
+            self._stats_arrays_version = table.version
+            uses = np.maximum(np.array(table.total_uses, dtype=np.float64), 1)
+            self._stats_arrays = (
+                dict(table.index()),
+                np.array(table.sum_latency, dtype=np.float64) / uses,
+                np.array(table.sum_throughput, dtype=np.float64) / uses,
+                np.array(table.sum_memory_efficiency, dtype=np.float64) / uses,
+                np.array(table.sum_success, dtype=np.float64) / uses,
+            )
+        return self._stats_arrays
+
+    def _update_weights(self):
+        """Precompute the scoring weights for the current preferences"""
+        # Latency, throughput, memory and success weights for the performance preference
         if self.preferences.performance_mode == PerformancePreference.SPEED:
-            latency_weight = 0.4
-            throughput_weight = 0.3
-            memory_weight = 0.1
+            self._weights = (0.4, 0.3, 0.1, 0.2)
         elif self.preferences.performance_mode == PerformancePreference.MEMORY:
-            latency_weight = 0.2
-            throughput_weight = 0.2
-            memory_weight = 0.4
+            self._weights = (0.2, 0.2, 0.4, 0.2)
         else:  # BALANCED
-            latency_weight = 0.3
-            throughput_weight = 0.3
-            memory_weight = 0.2
+            self._weights = (0.3, 0.3, 0.2, 0.2)
+
+        # Score multipliers for models that are not / are heavily (Q4) quantized
+        if self.preferences.accuracy_preference == AccuracyPreference.HIGH:
+            self._q4_mul = (1.0, 0.8)  # Penalize heavily quantized models
+        elif self.preferences.accuracy_preference == AccuracyPreference.LOW:
+            self._q4_mul = (1.0, 1.2)  # Favor more efficient models
+        else:
+            self._q4_mul = (1.0, 1.0)
+
+    def _score_vector(self, models: List[ModelMetadata], task_type: str) -> 'np.ndarray':
+        """Calculate scores for all models at once from historical performance"""
+        import numpy as np
+
+        scores = np.full(len(models), 0.5)  # Default score for new models
+        index, latency, throughput, memory, success = self._get_stats_arrays()
+        if not index:
+            return scores
+
+        indices = np.array([index.get(model.name, -1) for model in models], dtype=np.intp)
+        known = indices >= 0
+        indices = indices[known]
+        latency_weight, throughput_weight, memory_weight, success_weight = self._weights
 
         # Calculate weighted score components
-        score += (1 / (1 + stats.avg_latency)) * latency_weight
-        score += (stats.avg_throughput / 1000) * throughput_weight
-        score += stats.memory_efficiency * memory_weight
-        score += stats.success_rate * 0.2
+        known_scores = (
+            (1 / (1 + latency[indices])) * latency_weight
+            + (throughput[indices] / 1000) * throughput_weight
+            + memory[indices] * memory_weight
+            + success[indices] * success_weight
+        )
 
         # Apply accuracy preference adjustment
-        if self.preferences.accuracy_preference == AccuracyPreference.HIGH:
-            if model.quantization and 'Q4' in model.quantization:
-                score *= 0.8  # Penalize heavily quantized models
-        elif self.preferences.accuracy_preference == AccuracyPreference.LOW:
-            if model.quantization and 'Q4' in model.quantization:
-                score *= 1.2  # Favor more efficient models
-
-        return score
-
-    def update_stats(self, model: ModelMetadata, execution_metrics: Dict):
-        """Update performance statistics for a model"""
-        current_stats = self.usage_stats.get(model.name)
-        
-        new_stats = ModelUsageStats(
-            success_rate=(execution_metrics.get('success', False) + 
-                        (current_stats.success_rate * current_stats.total_uses if current_stats else 0)) /
-                        (1 + (current_stats.total_uses if current_stats else 0)),
-            avg_latency=execution_metrics.get('latency', 0) if not current_stats else
-                       (execution_metrics.get('latency', 0) + 
-                        current_stats.avg_latency * current_stats.total_uses) /
-                       (current_stats.total_uses + 1),
-            avg_throughput=execution_metrics.get('throughput', 0) if not current_stats else
-                         (execution_metrics.get('throughput', 0) + 
-                          current_stats.avg_throughput * current_stats.total_uses) /
-                         (current_stats.total_uses + 1),
-            memory_efficiency=execution_metrics.get('memory_efficiency', 0) if not current_stats else
-                           (execution_metrics.get('memory_efficiency', 0) + 
-                            current_stats.memory_efficiency * current_stats.total_uses) /
-                           (current_stats.total_uses + 1),
-            last_used=datetime.now(),
-            total_uses=1 if not current_stats else current_stats.total_uses + 1
+        q4_mask = np.array([self._is_q4(model) for model in models], dtype=np.intp)[known]
+        known_scores *= np.array(self._q4_mul)[q4_mask]
+
+        scores[known] = known_scores
+        return scores
+
+    def _is_q4(self, model: ModelMetadata) -> bool:
+        """Check whether a model is heavily (Q4) quantized, caching the result by quantization"""
+        quantization = model.quantization
+        is_q4 = self._q4_mask.get(quantization)
+        if is_q4 is None:
+            is_q4 = self._q4_mask[quantization] = bool(quantization) and 'Q4' in quantization
+        return is_q4
+
+    def calculate_model_score(self, model: ModelMetadata, task_type: str) -> float:
+        """Calculate a score for a model based on historical performance and task requirements"""
+        averages = self.usage_stats.averages(model.name)
+        if averages is None:
+            return 0.5  # Default score for new models
+
+        success_rate, avg_latency, avg_throughput, memory_efficiency = averages
+        latency_weight, throughput_weight, memory_weight, success_weight = self._weights
+        score = (
+            (1 / (1 + avg_latency)) * latency_weight
+            + (avg_throughput / 1000) * throughput_weight
+            + memory_efficiency * memory_weight
+            + success_rate * success_weight
         )
-        
-        self.usage_stats[model.name] = new_stats
-        self._save_stats()
+
+        # Apply accuracy preference adjustment
+        return score * self._q4_mul[self._is_q4(model)]
+
+    def update_stats(self, model: ModelMetadata, execution_metrics: Dict, persist: bool = True):
+        """Update performance statistics for a model
+
+        With persist=False the update is only kept in memory until the next
+        save, e.g. when real metrics for the same run will follow.
+        """
+        total_uses = self.usage_stats.record(
+            model.name,
+            success=execution_metrics.get('success', False),
+            latency=execution_metrics.get('latency', 0),
+            throughput=execution_metrics.get('throughput', 0),
+            memory_efficiency=execution_metrics.get('memory_efficiency', 0),
+            when=time()
+        )
+
+        self._dirty.add(model.name)
+        if persist:
+            self._maybe_flush(total_uses)
+
+    def _maybe_flush(self, total_uses: int):
+        """Save pending statistics if enough time or uses have passed since the last save"""
+        if not self._dirty:
+            return
+        if monotonic() - self._last_flush > STATS_FLUSH_INTERVAL or total_uses % STATS_FLUSH_EVERY == 0:
+            self._save_stats()
+
+    def flush(self):
+        """Save any pending usage statistics to cache"""
+        if self._dirty:
+            self._save_stats()
 
     def get_recommended_models(self, available_models: List[ModelMetadata], 
                              task_type: str,
                              top_k: int = 3) -> List[Tuple[ModelMetadata, float]]:
         """Get top-k recommended models for a task"""
-        scored_models = [
-            (model, self.calculate_model_score(model, task_type))
-            for model in available_models
-        ]
-        
-        # Sort by score in descending order
-        scored_models.sort(key=lambda x: x[1], reverse=True)
-        return scored_models[:top_k]
+        top_k = min(top_k, len(available_models))
+        if top_k <= 0:
+            return []
+
+        if len(available_models) <= VECTORIZE_THRESHOLD:
+            scored_models = [
+                (model, self.calculate_model_score(model, task_type))
+                for model in available_models
+            ]
+            return heapq.nlargest(top_k, scored_models, key=lambda x: x[1])
+
+        scores = self._score_vector(available_models, task_type)
+        return [(available_models[i], float(scores[i])) for i in self._top_k_indices(scores, top_k)]
+
+    @staticmethod
+    def _top_k_indices(scores: 'np.ndarray', top_k: int) -> 'np.ndarray':
+        """Get the indices of the top-k scores in descending order without a full sort
+
+        Ties keep their input order, matching a stable sort over all models.
+        """
+        import numpy as np
+
+        # Partition around the k-th best score, then sort just the k selected
+        kth = len(scores) - top_k
+        threshold = np.partition(scores, kth)[kth]
+        above = np.flatnonzero(scores > threshold)
+        tied = np.flatnonzero(scores == threshold)[:top_k - len(above)]
+        top = np.concatenate((above, tied))
+        return top[np.argsort(-scores[top], kind='stable')]
+
+    def current_cache_size(self) -> int:
+        """Get the total size of the cache directory in bytes, as last measured and since updated"""
+        return self._cache_bytes
+
+    def _measure_cache_size(self) -> int:
+        """Sum the sizes of all files under the cache directory"""
+        return sum(f.stat().st_size for f in self.cache_dir.glob('**/*') if f.is_file())
+
+    def _cache_files_by_model(self) -> Dict[str, List[os.DirEntry]]:
+        """Group the files in the cache directory by the models whose name they contain"""
+        # Bookkeeping files, never evicted with a model
+        stats_files = {
+            self.stats_file.name,
+            self.stats_file.with_suffix('.jsonl.tmp').name,
+            REGISTRY_CACHE_FILENAME,
+        }
+        files_by_model: Dict[str, List[os.DirEntry]] = {}
+        with os.scandir(self.cache_dir) as entries:
+            for entry in entries:
+                if entry.name.startswith('.') or entry.name in stats_files or not entry.is_file():
+                    continue
+                for model_name in self.usage_stats:
+                    if model_name in entry.name:
+                        files_by_model.setdefault(model_name, []).append(entry)
+        return files_by_model
 
     def cleanup_cache(self):
         """Clean up old cache entries based on preferences"""
         if not self.preferences.auto_cleanup_threshold:
             return
 
-        cache_size = sum(f.stat().st_size for f in self.cache_dir.glob('**/*') if f.is_file())
-        if cache_size > self.preferences.auto_cleanup_threshold * 1024 * 1024 * 1024:  # Convert GB to bytes
+        # Other processes may have written to the cache since it was last measured
+        self._cache_bytes = self._measure_cache_size()
+        if self._cache_bytes > self.preferences.auto_cleanup_threshold * 1024 * 1024 * 1024:  # Convert GB to bytes
             # Remove oldest entries first
-            stats_by_age = sorted(
-                self.usage_stats.items(),
-                key=lambda x: x[1].last_used
-            )
-            
-            for model_name, _ in stats_by_age:
-                if cache_size <= self.preferences.auto_cleanup_threshold * 0.8 * 1024 * 1024 * 1024:
+            files_by_model = self._cache_files_by_model()
+            removed = set()
+            for model_name in self.usage_stats.names_by_age():
+                if self._cache_bytes <= self.preferences.auto_cleanup_threshold * 0.8 * 1024 * 1024 * 1024:
                     break
                 
                 # Remove model files and stats
-                model_files = list(self.cache_dir.glob(f'*{model_name}*'))
-                for f in model_files:
-                    cache_size -= f.stat().st_size
-                    f.unlink()
+                for entry in files_by_model.get(model_name, ()):
+                    if entry.path not in removed:
+                        self._cache_bytes -= entry.stat().st_size
+                        os.unlink(entry.path)
+                        removed.add(entry.path)
                 
                 del self.usage_stats[model_name]
             
-            self._save_stats()
+            self._compact_stats()
@@ -1,5 +1,7 @@
 """Command-line interface for RavenXTerm."""
 
+from pathlib import Path
+
 import click
 
 from . import __version__
@@ -37,6 +39,18 @@ def generate(query: str) -> None:
     # TODO: Implement command generation
 
 
+@cli.command()
+@click.option('--pretty', is_flag=True, help="Indent the JSON for reading.")
+def stats(pretty: bool) -> None:
+    """Show recorded model usage statistics as JSON."""
+    # Imported here so other commands don't pay for the model stack
+    from .adaptive_selector import AdaptiveModelSelector
+    from .user_preferences import UserPreferences
+
+    preferences = UserPreferences.load(Path.home() / '.ravenxterm' / 'config.json')
+    click.echo(AdaptiveModelSelector(preferences).export_stats(pretty=pretty).decode())
+
+
 def main() -> None:
     """Main entry point for the CLI."""
     cli()
@@ -4,10 +4,12 @@ User-friendly interface for managing AI models and preferences.
 
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
+import copy
 from ravenxterm.model_registry import ModelRegistry, ModelMetadata
 from ravenxterm.user_preferences import UserPreferences, PerformancePreference, AccuracyPreference
 from ravenxterm.adaptive_selector import AdaptiveModelSelector
 
+
 class ModelManager:
     """High-level interface for managing AI models and user preferences"""
     
@@ -17,13 +19,16 @@ class ModelManager:
         self.models_dir = models_dir or Path.home() / '.ravenxterm' / 'models'
         self.registry = ModelRegistry(self.models_dir, self.preferences)
         self.selector = AdaptiveModelSelector(self.preferences)
+        # Hardware recommendations by model name, dropped when their inputs change.
+        # Batch sizes depend on free memory, so they are recomputed on every call
+        self._hardware_recommendations: Dict[str, Dict] = {}
 
     def get_system_status(self) -> Dict:
         """Get current system status and capabilities"""
         return {
             "hardware_profile": self.registry.hardware_profile,
             "available_models": len(self.registry.available_models),
-            "total_cache_size": sum(f.stat().st_size for f in self.preferences.cache_dir.glob('**/*') if f.is_file()),
+            "total_cache_size": self.selector.current_cache_size(),
             "performance_mode": self.preferences.performance_mode.value,
             "memory_usage": self.preferences.max_memory_usage * 100
         }
@@ -34,31 +39,46 @@ class ModelManager:
                          max_memory_usage: Optional[float] = None,
                          preferred_devices: Optional[List[str]] = None) -> None:
         """Update user preferences"""
+        changes = {}
         if performance_mode:
-            self.preferences.performance_mode = PerformancePreference(performance_mode)
+            changes['performance_mode'] = PerformancePreference(performance_mode)
         if accuracy_preference:
-            self.preferences.accuracy_preference = AccuracyPreference(accuracy_preference)
+            changes['accuracy_preference'] = AccuracyPreference(accuracy_preference)
         if max_memory_usage is not None:
-            self.preferences.max_memory_usage = max(0.1, min(0.9, max_memory_usage))
+            changes['max_memory_usage'] = max(0.1, min(0.9, max_memory_usage))
         if preferred_devices:
-            self.preferences.preferred_devices = preferred_devices
+            changes['preferred_devices'] = preferred_devices
         
+        # The registry and selector share this preferences object, so they see
+        # the new values without being rebuilt
+        changed = self.preferences.reconfigure(**changes)
         self.preferences.save(self.config_path)
-        self.registry = ModelRegistry(self.models_dir, self.preferences)
-        self.selector = AdaptiveModelSelector(self.preferences)
+        if changed:
+            self.selector.notify_preferences_changed(changed)
+            self._hardware_recommendations.clear()
+
+    def _get_hardware_recommendations(self, model: ModelMetadata) -> Dict:
+        """Get hardware recommendations for a model, reusing the parts that don't change between calls"""
+        cached = self._hardware_recommendations.get(model.name)
+        if cached is None:
+            cached = self._hardware_recommendations[model.name] = self.registry.get_hardware_recommendations(model)
+            return copy.deepcopy(cached)
+
+        # Callers may modify the result, so never hand out the cached dict itself
+        recommendations = copy.deepcopy(cached)
+        recommendations['recommended_batch_size'] = self.registry.recommended_batch_size(
+            model, recommendations['preferred_device']
+        )
+        return recommendations
 
     def get_model_recommendations(self, task_type: str, requirements: Dict) -> List[Tuple[ModelMetadata, float, Dict]]:
         """Get recommended models with detailed information"""
-        suitable_models = []
-        for model in self.registry.available_models.values():
-            if self.registry._meets_requirements(model, requirements):
-                suitable_models.append(model)
-        
+        suitable_models = self.registry.get_suitable_models(requirements)
         recommendations = self.selector.get_recommended_models(suitable_models, task_type)
         detailed_recommendations = []
         
         for model, score in recommendations:
-            hardware_info = self.registry.get_hardware_recommendations(model)
+            hardware_info = self._get_hardware_recommendations(model)
             detailed_recommendations.append((model, score, hardware_info))
         
         return detailed_recommendations
@@ -72,11 +92,12 @@ class ModelManager:
         # Select the highest scoring model
         best_model, score, hardware_info = recommendations[0]
         
-        # Record the selection for adaptive learning
+        # Record the selection for adaptive learning; the execution metrics
+        # recorded afterwards will save it
         self.selector.update_stats(best_model, {
             'success': True,
             'selected_score': score
-        })
+        }, persist=False)
         
         return best_model
 
@@ -84,6 +105,8 @@ class ModelManager:
         """Record execution metrics for adaptive learning"""
         self.selector.update_stats(model, metrics)
         self.registry.record_performance(model.name, metrics)
+        # Expected performance in the recommendations comes from this history
+        self._hardware_recommendations.pop(model.name, None)
 
     def cleanup_resources(self):
         """Clean up unused resources and optimize storage"""
@@ -107,7 +130,7 @@ class ModelManager:
             },
             "usage_stats": stats if stats else None,
             "performance_history": performance_history,
-            "hardware_recommendations": self.registry.get_hardware_recommendations(model)
+            "hardware_recommendations": self._get_hardware_recommendations(model)
         }
 
     def get_resource_usage(self) -> Dict:
@@ -119,7 +142,7 @@ class ModelManager:
                 "available": self.registry.hardware_profile.available_memory * self.preferences.max_memory_usage
             },
             "cache_usage": {
-                "total_size": sum(f.stat().st_size for f in self.preferences.cache_dir.glob('**/*') if f.is_file()),
+                "total_size": self.selector.current_cache_size(),
                 "threshold": self.preferences.auto_cleanup_threshold * 1024 * 1024 * 1024
             },
             "model_count": len(self.registry.available_models),
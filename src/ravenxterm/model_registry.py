@@ -3,15 +3,31 @@ ModelRegistry manages the lifecycle and selection of local AI models based on ha
 performance requirements, and user preferences.
 """
 
-from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, fields
 from enum import Enum
-from typing import Dict, List, Optional
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Deque, Dict, Iterable, List, Mapping, Optional, Set, Tuple, Union
+from ravenxterm import serialization
 from ravenxterm.user_preferences import UserPreferences, PerformancePreference, AccuracyPreference
+import collections
+import functools
+import importlib.metadata
+import logging
+import mmap
+import os
 import platform
+import re
+import struct
 import psutil
-import torch
+import zipfile
 from pathlib import Path
 
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = logging.getLogger(__name__)
+
 
 class ModelType(Enum):
     OLLAMA = "ollama"
@@ -26,7 +42,94 @@ class HardwareType(Enum):
     NPU = "npu"
 
 
-@dataclass
+# Module-level aliases, so registration and profiling skip the enum attribute lookup
+_HT_CPU = HardwareType.CPU
+_HT_CUDA = HardwareType.CUDA
+_HT_NPU = HardwareType.NPU
+
+# One bit per hardware type, for vectorized hardware compatibility checks
+_HW_BIT = {
+    HardwareType.CPU: 1,
+    HardwareType.CUDA: 2,
+    HardwareType.ROCM: 4,
+    HardwareType.NPU: 8,
+}
+# The same bits keyed by device name, as used in preferences.preferred_devices
+_HW_BIT_BY_NAME = {hw.value: bit for hw, bit in _HW_BIT.items()}
+
+
+def _hardware_mask(hardware: Iterable[HardwareType]) -> int:
+    """Combine hardware types into a bitmask of _HW_BIT values"""
+    mask = 0
+    for hw in hardware:
+        mask |= _HW_BIT.get(hw, 0)
+    return mask
+
+# Quantization tags in GGUF filenames, e.g. "q4_k_m" or "q8_0"
+_GGUF_QUANTIZATION_RE = re.compile(r'q([458])_(k_[ms]|[01])', re.IGNORECASE)
+
+# Bit width at the start of a quantization tag, e.g. 5 in "Q5_K_M"; float
+# formats such as "F16" or "fp16" have no level
+_QUANTIZATION_LEVEL_RE = re.compile(r'^Q(\d+)', re.IGNORECASE)
+
+# GGUF header layout: magic, version, then u64 tensor and metadata counts
+_GGUF_MAGIC = b'GGUF'
+_GGUF_HEADER = struct.Struct('<4sIQQ')
+# Struct formats of the fixed-size GGUF metadata value types
+_GGUF_SCALAR_FORMATS = {
+    0: '<B', 1: '<b', 2: '<H', 3: '<h', 4: '<I', 5: '<i',
+    6: '<f', 7: '<?', 10: '<Q', 11: '<q', 12: '<d',
+}
+_GGUF_TYPE_STRING = 8
+_GGUF_TYPE_ARRAY = 9
+# llama.cpp general.file_type values and their (quantization, bits per weight)
+_GGUF_FILE_TYPES = {
+    0: ("F32", 32),
+    1: ("F16", 16),
+    2: ("Q4_0", 4),
+    3: ("Q4_1", 4),
+    7: ("Q8_0", 8),
+    8: ("Q5_0", 5),
+    9: ("Q5_1", 5),
+    10: ("Q2_K", 2),
+    11: ("Q3_K_S", 3),
+    12: ("Q3_K_M", 3),
+    13: ("Q3_K_L", 3),
+    14: ("Q4_K_S", 4),
+    15: ("Q4_K_M", 4),
+    16: ("Q5_K_S", 5),
+    17: ("Q5_K_M", 5),
+    18: ("Q6_K", 6),
+}
+
+# Instruction sets reported in HardwareProfile, by CPU flag
+_INSTRUCTION_SET_FLAGS = [
+    ('AVX512', 'avx512f'),
+    ('AVX2', 'avx2'),
+    ('AVX', 'avx'),
+    ('AMX', 'amx_tile'),
+]
+
+# Registering more pending model files than this uses a thread pool
+PARALLEL_REGISTRATION_THRESHOLD = 8
+
+# Model files are registered from scandir entries, or from paths when called directly
+_ModelFile = Union[os.DirEntry, Path]
+
+# Metadata of registered model files is saved in the cache directory under this name
+REGISTRY_CACHE_FILENAME = 'registry.json'
+REGISTRY_CACHE_VERSION = 1
+
+# Detected hardware is saved here and reused while the machine looks the same
+HARDWARE_CACHE_PATH = Path.home() / '.ravenxterm' / 'hardware.json'
+# Bumped when detection changes, so older saved profiles are detected again
+HARDWARE_CACHE_VERSION = 3
+# Kernel driver state listing GPUs without loading CUDA, for the hardware cache key
+NVIDIA_PROC_DIR = Path('/proc/driver/nvidia')
+DEVICE_DIR = Path('/dev')
+
+
+@dataclass(slots=True, frozen=True)
 class HardwareProfile:
     """System hardware capabilities profile"""
     cpu_architecture: str
@@ -36,33 +139,37 @@ class HardwareProfile:
     available_memory: int
     gpu_devices: Dict[str, Dict]
     npu_devices: Dict[str, Dict]
+    _available_hw_mask: int = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        available = [_HT_CPU]
+        if self.gpu_devices:
+            available.append(_HT_CUDA)
+        if self.npu_devices:
+            available.append(_HT_NPU)
+        object.__setattr__(self, '_available_hw_mask', _hardware_mask(available))
 
     @classmethod
     def detect(cls) -> "HardwareProfile":
+        """Get the system hardware profile, detecting it only when not already known"""
+        return _detect_cached()
+
+    @classmethod
+    def _probe(cls) -> "HardwareProfile":
         """Detect and profile system hardware capabilities"""
-        cpu_info = platform.processor()
         memory = psutil.virtual_memory()
         
         # Basic GPU detection via PyTorch
         gpu_devices = {}
-        if torch.cuda.is_available():
-            for i in range(torch.cuda.device_count()):
-                props = torch.cuda.get_device_properties(i)
-                gpu_devices[f"cuda:{i}"] = {
-                    "name": props.name,
-                    "compute_capability": f"{props.major}.{props.minor}",
-                    "total_memory": props.total_memory,
-                    "multi_processor_count": props.multi_processor_count
-                }
-
-        # Instruction set detection for AVX, AVX2, AVX512
-        instruction_sets = []
-        if 'avx512' in cpu_info.lower():
-            instruction_sets.append('AVX512')
-        elif 'avx2' in cpu_info.lower():
-            instruction_sets.append('AVX2')
-        elif 'avx' in cpu_info.lower():
-            instruction_sets.append('AVX')
+        if _cuda_available():
+            for i in range(_cuda_device_count()):
+                gpu_devices[f"cuda:{i}"] = dict(_gpu_info(i))
+
+        # Instruction set detection for AVX, AVX2, AVX512 and int8/bf16 extensions
+        flags = _cpu_flags()
+        instruction_sets = [name for name, flag in _INSTRUCTION_SET_FLAGS if flag in flags]
+        if any('vnni' in flag for flag in flags):
+            instruction_sets.append('VNNI')  # int8 dot products, used by quantized GGUF kernels
         
         return cls(
             cpu_architecture=platform.machine(),
@@ -71,11 +178,180 @@ class HardwareProfile:
             instruction_sets=instruction_sets,
             available_memory=memory.total,
             gpu_devices=gpu_devices,
-        npu_devices=self._detect_npu_devices()
+            npu_devices=cls._detect_npu_devices()
         )
 
+    @staticmethod
+    def _detect_npu_devices() -> Dict[str, Dict]:
+        """Detect and profile available NPU devices"""
+        # Placeholder function for NPU detection
+        # Ideally, this would check for NPU hardware specifics
+        # This is kept simple as a placeholder
+        return {}
+
+
+def _cpu_flags() -> Set[str]:
+    """CPU feature flags, read from CPUID when py-cpuinfo is installed"""
+    try:
+        import cpuinfo
+    except ImportError:
+        # Rarely lists features, but better than nothing
+        return set(platform.processor().lower().split())
+    return set(cpuinfo.get_cpu_info().get('flags', []))
+
+
+def _torch():
+    """Import torch on first use, so sessions without PyTorch models never load it"""
+    import torch
+    return torch
+
+
+def _pytorch_preferred_hardware() -> List[HardwareType]:
+    """Hardware PyTorch models can run on in this process"""
+    return [_HT_CPU, _HT_CUDA] if _cuda_available() else [_HT_CPU]
+
+
+def _torch_version() -> str:
+    """Installed torch version, read from package metadata without importing torch"""
+    try:
+        return importlib.metadata.version('torch')
+    except importlib.metadata.PackageNotFoundError:
+        return 'none'
+
+
+@functools.lru_cache(maxsize=1)
+def _cuda_available() -> bool:
+    """Whether CUDA is usable, asking the driver only on first use"""
+    return _torch().cuda.is_available()
+
+
+@functools.lru_cache(maxsize=1)
+def _cuda_device_count() -> int:
+    """Number of CUDA devices, 0 when CUDA is unavailable"""
+    return _torch().cuda.device_count() if _cuda_available() else 0
+
+
+@functools.lru_cache(maxsize=16)
+def _gpu_info(index: int) -> Dict:
+    """Describe a CUDA device's static properties, querying the driver only once per device"""
+    props = _torch().cuda.get_device_properties(index)
+    return {
+        "name": props.name,
+        "compute_capability": f"{props.major}.{props.minor}",
+        "total_memory": props.total_memory,
+        "integrated": bool(getattr(props, 'is_integrated', False)),
+        "multi_processor_count": props.multi_processor_count
+    }
+
+
+def _gpu_free_memory(device: str, info: Dict) -> int:
+    """Currently free memory of a CUDA device, queried on every call as it changes at runtime"""
+    if info.get('integrated'):
+        # Integrated GPUs (e.g. Jetson) share system memory
+        return psutil.virtual_memory().available
+    try:
+        free_memory, _ = _torch().cuda.mem_get_info(int(device.split(':')[1]))
+    except (RuntimeError, ValueError, IndexError):
+        return info['total_memory']  # Driver unavailable; assume the device is idle
+    return free_memory
+
 
-@dataclass
+def _gpu_signature() -> str:
+    """List GPUs and the driver version as the NVIDIA kernel driver reports them"""
+    try:
+        gpus = sorted(os.listdir(NVIDIA_PROC_DIR / 'gpus'))  # One entry per PCI bus id
+    except OSError:
+        gpus = []
+    try:
+        with open(NVIDIA_PROC_DIR / 'version') as f:
+            driver = f.readline().strip()
+    except OSError:
+        driver = ''
+    try:
+        devices = sorted(name for name in os.listdir(DEVICE_DIR) if name.startswith('nvidia'))
+    except OSError:
+        devices = []
+    return ",".join(gpus + devices) + ";" + driver
+
+
+def _hardware_cache_key() -> str:
+    """Describe the machine cheaply, so hardware changes invalidate the saved profile
+
+    Avoids importing torch, so loading a saved profile doesn't pay for it.
+    """
+    return "|".join([
+        str(HARDWARE_CACHE_VERSION),
+        platform.machine(),
+        _torch_version(),
+        os.environ.get('CUDA_VISIBLE_DEVICES', ''),
+        _gpu_signature(),
+        str(psutil.virtual_memory().total),
+    ])
+
+
+@functools.lru_cache(maxsize=1)
+def _detect_cached() -> HardwareProfile:
+    """Load the saved hardware profile, or detect and save it on first run"""
+    key = _hardware_cache_key()
+    try:
+        data = serialization.loads(HARDWARE_CACHE_PATH.read_bytes())
+        if data['key'] == key:
+            profile = data['profile']
+            return HardwareProfile(**{f.name: profile[f.name] for f in fields(HardwareProfile) if f.init})
+    except (OSError, ValueError, KeyError, TypeError):
+        pass  # Missing, stale or unreadable; detect again
+
+    profile = HardwareProfile._probe()
+    try:
+        HARDWARE_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        HARDWARE_CACHE_PATH.write_bytes(serialization.dumps({'key': key, 'profile': profile}))
+    except OSError:
+        pass  # Detecting again next run is fine
+    return profile
+
+
+def _model_name(model_path: _ModelFile) -> str:
+    """Model name for a model file: its filename without the extension"""
+    return os.path.splitext(model_path.name)[0]
+
+
+def _read_gguf_file_type(path: _ModelFile) -> Optional[int]:
+    """Read general.file_type from a GGUF header, touching only the header pages"""
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        magic, version, _, kv_count = _GGUF_HEADER.unpack_from(buf, 0)
+        if magic != _GGUF_MAGIC or version < 2:
+            return None  # Version 1 used 32-bit counts; too old to bother with
+        offset = _GGUF_HEADER.size
+        for _ in range(kv_count):
+            key_len, = struct.unpack_from('<Q', buf, offset)
+            key = bytes(buf[offset + 8:offset + 8 + key_len])
+            value_type, = struct.unpack_from('<I', buf, offset + 8 + key_len)
+            offset += 12 + key_len
+            if key == b'general.file_type' and value_type in _GGUF_SCALAR_FORMATS:
+                return struct.unpack_from(_GGUF_SCALAR_FORMATS[value_type], buf, offset)[0]
+            offset = _skip_gguf_value(buf, offset, value_type)
+    return None
+
+
+def _skip_gguf_value(buf, offset: int, value_type: int) -> int:
+    """Return the offset just past a GGUF metadata value"""
+    if value_type in _GGUF_SCALAR_FORMATS:
+        return offset + struct.calcsize(_GGUF_SCALAR_FORMATS[value_type])
+    if value_type == _GGUF_TYPE_STRING:
+        length, = struct.unpack_from('<Q', buf, offset)
+        return offset + 8 + length
+    if value_type == _GGUF_TYPE_ARRAY:
+        item_type, count = struct.unpack_from('<IQ', buf, offset)
+        offset += 12
+        if item_type in _GGUF_SCALAR_FORMATS:
+            return offset + count * struct.calcsize(_GGUF_SCALAR_FORMATS[item_type])
+        for _ in range(count):
+            offset = _skip_gguf_value(buf, offset, item_type)
+        return offset
+    raise ValueError(f"Unknown GGUF value type {value_type}")
+
+
+@dataclass(slots=True, frozen=True)
 class ModelMetadata:
     """Metadata for an AI model including requirements and capabilities"""
     name: str
@@ -86,39 +362,219 @@ class ModelMetadata:
     supports_batching: bool
     quantization: Optional[str] = None
     performance_metrics: Dict = None
+    quantization_level: Optional[int] = None  # Bits per weight, derived from quantization
+    _hw_mask: int = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        # Frozen, so derived fields are set through object.__setattr__
+        if self.quantization_level is None and self.quantization:
+            match = _QUANTIZATION_LEVEL_RE.match(self.quantization)
+            if match is not None:
+                object.__setattr__(self, 'quantization_level', int(match.group(1)))
+        object.__setattr__(self, '_hw_mask', _hardware_mask(self.preferred_hardware))
+
+    def to_dict(self) -> Dict:
+        """Convert to JSON-compatible values, as stored in the registry cache"""
+        return {
+            'name': self.name,
+            'model_type': self.model_type.value,
+            'size_bytes': self.size_bytes,
+            'minimum_ram': self.minimum_ram,
+            'preferred_hardware': [hw.value for hw in self.preferred_hardware],
+            'supports_batching': self.supports_batching,
+            'quantization': self.quantization,
+            'performance_metrics': self.performance_metrics,
+            'quantization_level': self.quantization_level,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "ModelMetadata":
+        """Rebuild metadata saved with to_dict"""
+        return cls(
+            name=data['name'],
+            model_type=ModelType(data['model_type']),
+            size_bytes=data['size_bytes'],
+            minimum_ram=data['minimum_ram'],
+            preferred_hardware=[HardwareType(hw) for hw in data['preferred_hardware']],
+            supports_batching=data['supports_batching'],
+            quantization=data['quantization'],
+            performance_metrics=data['performance_metrics'],
+            quantization_level=data['quantization_level'],
+        )
 
 
 class ModelRegistry:
     def __init__(self, models_dir: Path, preferences: Optional[UserPreferences] = None):
-        self.preferences = preferences or UserPreferences.get_defaults()
+        self._initial_preferences = preferences
         self.models_dir = Path(models_dir)
         self.hardware_profile = HardwareProfile.detect()
-        self.available_models: Dict[str, ModelMetadata] = {}
-        self.performance_history: Dict[str, Dict] = {}
-        self._load_available_models()
+        self._available_models: Dict[str, ModelMetadata] = {}
+        # Model files found by the directory scan but not yet registered
+        self._pending: Dict[str, Tuple[_ModelFile, ModelType]] = {}
+        # Per-model columns used to filter models with vectorized comparisons,
+        # rebuilt lazily after the available models change
+        self._model_index_stale = True
+        self._idx_models: List[ModelMetadata] = []
+        self._idx_min_ram: Optional['np.ndarray'] = None
+        self._idx_size: Optional['np.ndarray'] = None
+        self._idx_quant_level: Optional['np.ndarray'] = None
+        self._idx_supports_batching: Optional['np.ndarray'] = None
+        self._idx_hw_mask: Optional['np.ndarray'] = None
+        self.performance_history: Dict[str, Deque[Dict]] = {}
+        # Running sums over each model's history window, updated by record_performance
+        self._perf_stats: Dict[str, Dict[str, float]] = {}
+        self._index_available_models()
 
-    def _load_available_models(self):
-        """Scan models directory and load metadata for available models"""
+    @functools.cached_property
+    def preferences(self) -> UserPreferences:
+        """User preferences, built from the defaults on first access when none were given"""
+        return self._initial_preferences or UserPreferences.get_defaults()
+
+    @property
+    def available_models(self) -> Mapping[str, ModelMetadata]:
+        """Read-only view of registered models by name, registering scanned files on first access"""
+        if self._pending:
+            self._register_pending_models()
+        # Writes must go through the setter or _add_model so the model index is rebuilt
+        return MappingProxyType(self._available_models)
+
+    @available_models.setter
+    def available_models(self, models: Mapping[str, ModelMetadata]):
+        self._pending = {}
+        self._available_models = dict(models)
+        self._model_index_stale = True
+
+    def _add_model(self, metadata: ModelMetadata):
+        """Add a model to the registry"""
+        self._available_models[metadata.name] = metadata
+        self._model_index_stale = True
+
+    def _index_available_models(self):
+        """Scan models directory for model files, leaving registration until they are needed"""
         if not self.models_dir.exists():
             self.models_dir.mkdir(parents=True)
             return
 
-        # Scan for different model types
-        for model_path in self.models_dir.glob("**/*"):
-            if model_path.is_file():
-                if model_path.suffix in ['.gguf']:
-                    self._register_gguf_model(model_path)
-                elif model_path.suffix in ['.pt', '.pth']:
-                    self._register_pytorch_model(model_path)
-    def _detect_npu_devices(self) -> Dict[str, Dict]:
-        """Detect and profile available NPU devices"""
-        # Placeholder function for NPU detection
-        # Ideally, this would check for NPU hardware specifics
-        # This is kept simple as a placeholder
+        # Scan for different model types. os.scandir reports entry types from
+        # the directory listing, and entries are kept so their stat() result
+        # is reused at registration rather than fetched again
+        pending_dirs = [str(self.models_dir)]
+        while pending_dirs:
+            directory = pending_dirs.pop()
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            pending_dirs.append(entry.path)
+                        elif entry.name.endswith('.gguf'):
+                            if entry.is_file():
+                                self._pending[_model_name(entry)] = (entry, ModelType.GGUF)
+                        elif entry.name.endswith(('.pt', '.pth')):
+                            if entry.is_file():
+                                self._pending[_model_name(entry)] = (entry, ModelType.PYTORCH)
+            except OSError as e:
+                logger.warning("Failed to scan %s: %s", directory, e)
+
+    def _register_pending_models(self):
+        """Register the model files found by the last directory scan"""
+        pending, self._pending = self._pending, {}
+        cache = self._load_registry_cache()
+        builders = {
+            ModelType.GGUF: self._build_gguf_metadata,
+            ModelType.PYTORCH: self._build_pytorch_metadata,
+        }
+        # Reuse cached metadata of files unchanged since they were last registered
+        jobs = list(pending.values())
+        results: List[Optional[ModelMetadata]] = [self._cached_metadata(cache, entry) for entry, _ in jobs]
+        misses = [i for i, metadata in enumerate(results) if metadata is None]
+
+        def build(job: Tuple[_ModelFile, ModelType]) -> Optional[ModelMetadata]:
+            entry, model_type = job
+            return builders[model_type](entry)
+
+        # Registration is I/O bound (stat, header reads, zip peeks), so threads overlap it well
+        if len(misses) <= PARALLEL_REGISTRATION_THRESHOLD:
+            built = [build(jobs[i]) for i in misses]
+        else:
+            workers = min(32, (os.cpu_count() or 1) * 4)
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ravenxterm-registry') as pool:
+                built = list(pool.map(build, (jobs[i] for i in misses)))
+        for i, metadata in zip(misses, built):
+            results[i] = metadata
+
+        self._available_models.update(
+            (metadata.name, metadata) for metadata in results if metadata is not None
+        )
+        self._model_index_stale = True
+
+        # Rewrite the cache when files were added, changed or removed
+        if misses or len(cache) != len(jobs):
+            self._save_registry_cache(
+                (entry, metadata) for (entry, _), metadata in zip(jobs, results) if metadata is not None
+            )
+
+    def _registry_cache_path(self) -> Path:
+        """Path of the saved model metadata"""
+        return Path(self.preferences.cache_dir) / REGISTRY_CACHE_FILENAME
+
+    def _load_registry_cache(self) -> Dict[str, Dict]:
+        """Load the saved metadata of registered model files, keyed by path"""
+        try:
+            data = serialization.loads(self._registry_cache_path().read_bytes())
+            if data['version'] == REGISTRY_CACHE_VERSION:
+                return data['models']
+        except (OSError, ValueError, KeyError, TypeError):
+            pass  # Missing or unreadable; register every file again
         return {}
 
-    def _register_gguf_model(self, model_path: Path):
+    def _cached_metadata(self, cache: Dict[str, Dict], model_path: _ModelFile) -> Optional[ModelMetadata]:
+        """Get saved metadata for a model file, or None if the file changed since it was saved"""
+        cached = cache.get(os.fspath(model_path))
+        if cached is None:
+            return None
+        try:
+            stat = model_path.stat()
+            if cached['mtime_ns'] != stat.st_mtime_ns or cached['size'] != stat.st_size:
+                return None
+            data = cached['metadata']
+            if data['model_type'] == ModelType.PYTORCH.value:
+                # Depends on this machine's CUDA support, not on the file
+                data = {**data, 'preferred_hardware': [hw.value for hw in _pytorch_preferred_hardware()]}
+            return ModelMetadata.from_dict(data)
+        except (OSError, KeyError, ValueError, TypeError):
+            return None
+
+    def _save_registry_cache(self, registered: Iterable[Tuple[_ModelFile, ModelMetadata]]):
+        """Save the metadata of registered model files, keyed by path, mtime and size"""
+        models = {}
+        for model_path, metadata in registered:
+            try:
+                stat = model_path.stat()
+            except OSError:
+                continue
+            models[os.fspath(model_path)] = {
+                'mtime_ns': stat.st_mtime_ns,
+                'size': stat.st_size,
+                'metadata': metadata.to_dict(),
+            }
+
+        cache_path = self._registry_cache_path()
+        tmp_path = cache_path.with_suffix('.json.tmp')
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path.write_bytes(serialization.dumps({'version': REGISTRY_CACHE_VERSION, 'models': models}))
+            os.replace(tmp_path, cache_path)
+        except OSError:
+            pass  # Registering the files again next run is fine
+
+    def _register_gguf_model(self, model_path: _ModelFile):
         """Register a GGUF model and its metadata"""
+        metadata = self._build_gguf_metadata(model_path)
+        if metadata is not None:
+            self._add_model(metadata)
+
+    def _build_gguf_metadata(self, model_path: _ModelFile) -> Optional[ModelMetadata]:
+        """Build metadata for a GGUF model, or None if it cannot be read"""
         try:
             # Extract basic file information
             size_bytes = model_path.stat().st_size
@@ -126,58 +582,67 @@ class ModelRegistry:
             # Estimate minimum RAM requirements (typically 2x model size for GGUF)
             minimum_ram = size_bytes * 2
             
+            quantization, quantization_level = self._detect_gguf_quantization(model_path)
+
             # Create metadata entry
             metadata = ModelMetadata(
-                name=model_path.stem,
+                name=_model_name(model_path),
                 model_type=ModelType.GGUF,
                 size_bytes=size_bytes,
                 minimum_ram=minimum_ram,
-                preferred_hardware=[HardwareType.CPU],  # GGUF models are CPU-optimized
+                preferred_hardware=[_HT_CPU],  # GGUF models are CPU-optimized
                 supports_batching=False,  # Most GGUF models don't support batching
-                quantization=self._detect_gguf_quantization(model_path),
-                performance_metrics={}
+                quantization=quantization,
+                performance_metrics={},
+                quantization_level=quantization_level
             )
-            
-            self.available_models[model_path.stem] = metadata
         except Exception as e:
-            print(f"Failed to register GGUF model {model_path}: {e}")
-
-    def _detect_gguf_quantization(self, model_path: Path) -> Optional[str]:
-        """Detect GGUF model quantization from filename"""
-        name = model_path.stem.lower()
-        if 'q4_k_m' in name:
-            return 'Q4_K_M'
-        elif 'q4_k_s' in name:
-            return 'Q4_K_S'
-        elif 'q4_0' in name:
-            return 'Q4_0'
-        elif 'q4_1' in name:
-            return 'Q4_1'
-        elif 'q5_0' in name:
-            return 'Q5_0'
-        elif 'q5_1' in name:
-            return 'Q5_1'
-        elif 'q8_0' in name:
-            return 'Q8_0'
-        return None
-
-    def _register_pytorch_model(self, model_path: Path):
+            logger.warning("Failed to register GGUF model %s: %s", os.fspath(model_path), e)
+            return None
+        return metadata
+
+    def _detect_gguf_quantization(self, model_path: _ModelFile) -> Tuple[Optional[str], Optional[int]]:
+        """Detect GGUF model quantization and its bit width from its header, or failing that its filename"""
+        try:
+            file_type = _read_gguf_file_type(model_path)
+        except (OSError, ValueError, struct.error):
+            file_type = None  # Empty, truncated or not GGUF at all
+        if file_type in _GGUF_FILE_TYPES:
+            return _GGUF_FILE_TYPES[file_type]
+
+        match = _GGUF_QUANTIZATION_RE.search(_model_name(model_path))
+        if match is None:
+            return None, None
+        return match.group(0).upper(), int(match.group(1))
+
+    def _register_pytorch_model(self, model_path: _ModelFile):
         """Register a PyTorch model and its metadata"""
+        metadata = self._build_pytorch_metadata(model_path)
+        if metadata is not None:
+            self._add_model(metadata)
+
+    def _build_pytorch_metadata(self, model_path: _ModelFile) -> Optional[ModelMetadata]:
+        """Build metadata for a PyTorch checkpoint, or None if it cannot be read"""
         try:
-            # Load model metadata without loading the full model
-            model_info = torch.load(model_path, map_location='cpu')
+            # Check the file is a checkpoint without loading its weights
+            path = os.fspath(model_path)
+            if zipfile.is_zipfile(path):
+                with zipfile.ZipFile(path) as archive:
+                    if not any(name.endswith('data.pkl') for name in archive.namelist()):
+                        raise ValueError("not a PyTorch checkpoint")
+            else:
+                # Legacy (pre-zip) checkpoints; meta tensors allocate no storage
+                _torch().load(path, map_location='meta', weights_only=True)
             
             # Extract size information
             size_bytes = model_path.stat().st_size
             
             # Determine hardware preferences
-            preferred_hardware = [HardwareType.CPU]
-            if torch.cuda.is_available():
-                preferred_hardware.append(HardwareType.CUDA)
+            preferred_hardware = _pytorch_preferred_hardware()
             
             # Create metadata entry
             metadata = ModelMetadata(
-                name=model_path.stem,
+                name=_model_name(model_path),
                 model_type=ModelType.PYTORCH,
                 size_bytes=size_bytes,
                 minimum_ram=size_bytes * 3,  # PyTorch typically needs 2-4x model size
@@ -185,23 +650,17 @@ class ModelRegistry:
                 supports_batching=True,  # Most PyTorch models support batching
                 performance_metrics={}
             )
-            
-            self.available_models[model_path.stem] = metadata
         except Exception as e:
-            print(f"Failed to register PyTorch model {model_path}: {e}")
+            logger.warning("Failed to register PyTorch model %s: %s", os.fspath(model_path), e)
+            return None
+        return metadata
 
     def select_model(self, task_requirements: Dict) -> Optional[ModelMetadata]:
         """
         Select the most appropriate model based on task requirements,
         hardware capabilities, and performance history.
         """
-        suitable_models = []
-        # Apply custom weights for model selection if available
-        custom_weight = self.preferences.custom_model_weights.get(model.name, 1.0)
-        score *= custom_weight
-        for model in self.available_models.values():
-            if self._meets_requirements(model, task_requirements):
-                suitable_models.append(model)
+        suitable_models = self.get_suitable_models(task_requirements)
 
         if not suitable_models:
             return None
@@ -211,125 +670,208 @@ class ModelRegistry:
 
     def _meets_requirements(self, model: ModelMetadata, requirements: Dict) -> bool:
         """Check if a model meets the specified requirements"""
-        # Check minimum memory requirements
-        if model.minimum_ram > self.hardware_profile.available_memory:
+        max_size = requirements.get('max_size_bytes')
+        requires_batching = requirements.get('requires_batching')
+        required_hardware = requirements.get('required_hardware')
+        max_quantization = requirements.get('max_quantization')
+
+        # Check model size constraints (cheapest checks first)
+        if max_size and model.size_bytes > max_size:
+            return False
+
+        # Check batching requirements
+        if requires_batching and not model.supports_batching:
             return False
 
         # Check if required hardware is available
-        if requirements.get('required_hardware'):
-            required_hardware = requirements['required_hardware']
-            if not any(hw in model.preferred_hardware for hw in required_hardware):
-                return False
+        if required_hardware and not model._hw_mask & _hardware_mask(required_hardware):
+            return False
 
         # Check quantization requirements
-        if requirements.get('max_quantization'):
-            if model.quantization:
-                quant_level = int(model.quantization.split('_')[0][1])  # Extract Q4, Q5, Q8 etc.
-                if quant_level > requirements['max_quantization']:
-                    return False
-
-        # Check batching requirements
-        if requirements.get('requires_batching') and not model.supports_batching:
+        if max_quantization and model.quantization_level is not None and model.quantization_level > max_quantization:
             return False
 
-        # Check model size constraints
-        if requirements.get('max_size_bytes') and model.size_bytes > requirements['max_size_bytes']:
+        # Check minimum memory requirements
+        if model.minimum_ram > self.hardware_profile.available_memory:
             return False
 
         return True
 
+    def _build_model_index(self):
+        """Rebuild the per-model columns used by _meets_requirements_vec"""
+        import numpy as np
+
+        models = list(self.available_models.values())
+        self._idx_models = models
+        self._idx_min_ram = np.array([m.minimum_ram for m in models], dtype=np.int64)
+        self._idx_size = np.array([m.size_bytes for m in models], dtype=np.int64)
+        # -1 marks unquantized models, which pass any max_quantization
+        self._idx_quant_level = np.array(
+            [-1 if m.quantization_level is None else m.quantization_level for m in models], dtype=np.int8
+        )
+        self._idx_supports_batching = np.array([m.supports_batching for m in models], dtype=np.bool_)
+        self._idx_hw_mask = np.array(
+            [m._hw_mask for m in models], dtype=np.uint8
+        )
+        self._model_index_stale = False
+
+    def _meets_requirements_vec(self, requirements: Dict) -> 'np.ndarray':
+        """Check all registered models against the requirements at once
+
+        Returns a boolean mask aligned with self._idx_models; see _meets_requirements.
+        """
+        if self._model_index_stale or self._pending:
+            self._build_model_index()
+
+        mask = self._idx_min_ram <= self.hardware_profile.available_memory
+
+        if requirements.get('required_hardware'):
+            required_mask = _hardware_mask(requirements['required_hardware'])
+            mask &= (self._idx_hw_mask & required_mask) != 0
+
+        if requirements.get('max_quantization'):
+            mask &= self._idx_quant_level <= requirements['max_quantization']
+
+        if requirements.get('requires_batching'):
+            mask &= self._idx_supports_batching
+
+        if requirements.get('max_size_bytes'):
+            mask &= self._idx_size <= requirements['max_size_bytes']
+
+        return mask
+
+    def get_suitable_models(self, requirements: Dict) -> List[ModelMetadata]:
+        """Get all registered models that meet the specified requirements"""
+        import numpy as np
+
+        mask = self._meets_requirements_vec(requirements)
+        return [self._idx_models[i] for i in np.flatnonzero(mask)]
+
     def _rank_models(self, models: List[ModelMetadata], requirements: Dict) -> List[ModelMetadata]:
         """Rank models based on performance history and hardware compatibility"""
-        def calculate_score(model: ModelMetadata) -> float:
-            score = 0.0
-            
-            # Performance history score (if available)
-            if model.name in self.performance_history:
-                history = self.performance_history[model.name]
-                if history:
-                    avg_latency = sum(m.get('latency', 0) for m in history) / len(history)
-                    avg_throughput = sum(m.get('throughput', 0) for m in history) / len(history)
-                    score += (1 / avg_latency) * 0.4  # Lower latency is better
-                    score += avg_throughput * 0.3     # Higher throughput is better
-            
-            # Hardware compatibility score
-            available_hardware = set(device for device in self.hardware_profile.gpu_devices)
-            preferred_hardware = set(hw.value for hw in model.preferred_hardware)
-            hardware_match = len(available_hardware.intersection(preferred_hardware))
-            score += hardware_match * 0.2
-            
-            # Size efficiency score (smaller is better, within requirements)
-            if requirements.get('max_size_bytes'):
-                size_ratio = model.size_bytes / requirements['max_size_bytes']
-                score += (1 - size_ratio) * 0.1
-            
-            return score
-        
-        # Sort models by score in descending order
-        return sorted(models, key=calculate_score, reverse=True)
-        return sorted(models, key=calculate_score, reverse=True)
+        import numpy as np
+
+        if not models:
+            return []
+
+        names = [model.name for model in models]
+        avg_latency = np.array([self.avg_latency(name) for name in names])
+        avg_throughput = np.array([self.avg_throughput(name) for name in names])
+
+        # Performance history score, zero for models without history
+        inv_latency = np.divide(1.0, avg_latency, out=np.zeros_like(avg_latency), where=avg_latency > 0)
+        scores = 0.4 * inv_latency + 0.3 * avg_throughput  # Lower latency, higher throughput is better
+
+        # Hardware compatibility score
+        available_mask = self.hardware_profile._available_hw_mask
+        hardware_match = np.array([(model._hw_mask & available_mask).bit_count() for model in models])
+        scores += 0.2 * hardware_match
+
+        # Size efficiency score (smaller is better, within requirements)
+        if requirements.get('max_size_bytes'):
+            size_ratio = np.array([model.size_bytes for model in models]) / requirements['max_size_bytes']
+            scores += 0.1 * (1 - size_ratio)
+
+        # Apply custom weights for model selection if available
+        custom_weights = self.preferences.custom_model_weights
+        if custom_weights:
+            scores *= np.array([custom_weights.get(name, 1.0) for name in names])
+
+        # Sort models by score in descending order, keeping ties in input order
+        return [models[i] for i in np.argsort(-scores, kind='stable')]
+
+    def record_performance(self, model_name: str, metrics: Dict):
+        """Record performance metrics for a model"""
+        if model_name not in self.performance_history:
+            self.performance_history[model_name] = collections.deque(
+                maxlen=self.preferences.model_usage_history_size
+            )
+            self._perf_stats[model_name] = {'n': 0, 'lat_sum': 0.0, 'tp_sum': 0.0}
+        history = self.performance_history[model_name]
+        stats = self._perf_stats[model_name]
+        if not history.maxlen:
+            return  # A history size of 0 keeps no history
+
+        # A full deque drops its oldest entry on append; take it out of the sums first
+        if len(history) == history.maxlen:
+            evicted = history[0]
+            stats['n'] -= 1
+            stats['lat_sum'] -= evicted.get('latency', 0)
+            stats['tp_sum'] -= evicted.get('throughput', 0)
+
+        history.append(metrics)
+        stats['n'] += 1
+        stats['lat_sum'] += metrics.get('latency', 0)
+        stats['tp_sum'] += metrics.get('throughput', 0)
+
+    def avg_latency(self, model_name: str) -> float:
+        """Mean latency over the model's recorded history, 0.0 without history"""
+        stats = self._perf_stats.get(model_name)
+        return stats['lat_sum'] / stats['n'] if stats and stats['n'] else 0.0
+
+    def avg_throughput(self, model_name: str) -> float:
+        """Mean throughput over the model's recorded history, 0.0 without history"""
+        stats = self._perf_stats.get(model_name)
+        return stats['tp_sum'] / stats['n'] if stats and stats['n'] else 0.0
 
     def cache_model_usage(self, model_name: str):
         """Cache model usage history for adaptive selection"""
         # Placeholder for caching mechanism
         # Implement logic to keep a rolling cache of recent model usage
         pass
-        """Record performance metrics for a model"""
-        if model_name not in self.performance_history:
-            self.performance_history[model_name] = []
-        self.performance_history[model_name].append(metrics)
+
+    def recommended_batch_size(self, model: ModelMetadata, device: str) -> Optional[int]:
+        """Recommend a batch size for a model on a device, from the memory free right now"""
+        if not model.supports_batching:
+            return None
+
+        # Apply user preferences for memory usage
+        max_memory = self.hardware_profile.available_memory * self.preferences.max_memory_usage
+        gpu = self.hardware_profile.gpu_devices.get(device)
+        if gpu is not None:
+            # Conservative estimate: use 70% of free GPU memory
+            usable_memory = min(max_memory, _gpu_free_memory(device, gpu)) * 0.7
+        else:
+            # More conservative with CPU memory (50%)
+            usable_memory = max_memory * 0.5
+        return max(1, int(usable_memory / model.minimum_ram))
 
     def get_hardware_recommendations(self, model: ModelMetadata) -> Dict:
         """Get hardware recommendations for optimal model performance"""
-        # Apply user preferences for memory usage and preferred devices
-        max_memory = self.hardware_profile.available_memory * self.preferences.max_memory_usage
-        preferred_devices = self.preferences.preferred_devices
+        # Apply user preferences for preferred devices
+        preferred_mask = 0
+        for device in self.preferences.preferred_devices:
+            preferred_mask |= _HW_BIT_BY_NAME.get(device, 0)
 
         recommendations = {
             "preferred_device": None,
             "minimum_memory": model.minimum_ram,
             "recommended_batch_size": None,
             "expected_performance": None,
-            "custom_weights": {}
+            "custom_weights": {},
             "warnings": []
         }
         
         # Determine preferred device based on model type and available hardware
-if set(preferred_devices).intersection(set(hw.value for hw in model.preferred_hardware)) and self.hardware_profile.gpu_devices:
+        if preferred_mask & model._hw_mask and self.hardware_profile.gpu_devices:
             # Select the GPU with the most memory
             best_gpu = max(
                 self.hardware_profile.gpu_devices.items(),
                 key=lambda x: x[1]['total_memory']
             )
             recommendations['preferred_device'] = best_gpu[0]
-            
-            # Calculate recommended batch size based on GPU memory
-            available_memory = best_gpu[1]['total_memory']
-            if model.supports_batching:
-                # Conservative estimate: use 70% of available memory
-            usable_memory = min(max_memory, available_memory) * 0.7
-                recommended_batch_size = max(1, int(usable_memory / model.minimum_ram))
-                recommendations['recommended_batch_size'] = recommended_batch_size
         else:
             recommendations['preferred_device'] = 'cpu'
-            
-            # CPU batch size based on available system memory
-            if model.supports_batching:
-                # More conservative with CPU memory (50%)
-                usable_memory = max_memory * 0.5
-                recommended_batch_size = max(1, int(usable_memory / model.minimum_ram))
-                recommendations['recommended_batch_size'] = recommended_batch_size
+        recommendations['recommended_batch_size'] = self.recommended_batch_size(
+            model, recommendations['preferred_device']
+        )
         
         # Estimate expected performance based on historical data
-        if model.name in self.performance_history:
-            history = self.performance_history[model.name]
-            if history:
-                avg_latency = sum(m.get('latency', 0) for m in history) / len(history)
-                avg_throughput = sum(m.get('throughput', 0) for m in history) / len(history)
-                recommendations['expected_performance'] = {
-                    'avg_latency_ms': avg_latency * 1000,  # Convert to milliseconds
-                    'avg_throughput_tokens_per_sec': avg_throughput
-                }
+        if self.performance_history.get(model.name):
+            recommendations['expected_performance'] = {
+                'avg_latency_ms': self.avg_latency(model.name) * 1000,  # Convert to milliseconds
+                'avg_throughput_tokens_per_sec': self.avg_throughput(model.name)
+            }
         
         # Add warnings for potential issues
         if model.minimum_ram > self.hardware_profile.available_memory * 0.8:
@@ -0,0 +1,46 @@
+"""
+JSON encoding helpers for the caches and config files.
+
+Uses orjson when it is installed and falls back to the standard library.
+"""
+
+from dataclasses import asdict, is_dataclass
+from datetime import datetime
+from enum import Enum
+from pathlib import Path
+from typing import Any, Union
+import json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - exercised without the speedups extra
+    orjson = None
+
+
+def _default(obj: Any) -> Any:
+    """Convert objects the JSON encoders don't handle natively"""
+    if isinstance(obj, Path):
+        return str(obj)
+    if isinstance(obj, Enum):
+        return obj.value
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    if is_dataclass(obj) and not isinstance(obj, type):
+        return asdict(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj: Any, pretty: bool = False) -> bytes:
+    """Serialize an object to UTF-8 encoded JSON, compact unless pretty is set"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_INDENT_2 if pretty else 0)
+    if pretty:
+        return json.dumps(obj, default=_default, indent=2).encode()
+    return json.dumps(obj, default=_default, separators=(',', ':')).encode()
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """Deserialize a JSON document"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
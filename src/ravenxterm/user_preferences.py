@@ -2,11 +2,14 @@
 Manages user preferences and settings for the AI system.
 """
 
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, fields
 from pathlib import Path
-import json
-from typing import Dict, List, Optional
+import logging
+from typing import Any, Dict, List, Optional, Set
 from enum import Enum
+from ravenxterm import serialization
+
+logger = logging.getLogger(__name__)
 
 class PerformancePreference(Enum):
     SPEED = "speed"
@@ -18,7 +21,7 @@ class AccuracyPreference(Enum):
     MEDIUM = "medium"
     LOW = "low"
 
-@dataclass
+@dataclass(slots=True)
 class UserPreferences:
     """User preferences for AI model behavior and performance"""
     performance_mode: PerformancePreference
@@ -38,9 +41,8 @@ class UserPreferences:
             return cls.get_defaults()
 
         try:
-            with open(config_path, 'r') as f:
-                data = json.load(f)
-            
+            data = serialization.loads(config_path.read_bytes())
+
             return cls(
                 performance_mode=PerformancePreference(data.get('performance_mode', 'balanced')),
                 accuracy_preference=AccuracyPreference(data.get('accuracy_preference', 'medium')),
@@ -53,15 +55,27 @@ class UserPreferences:
                 custom_model_weights=data.get('custom_model_weights', {})
             )
         except Exception as e:
-            print(f"Error loading preferences: {e}. Using defaults.")
+            logger.warning("Error loading preferences: %s. Using defaults.", e)
             return cls.get_defaults()
 
+    def reconfigure(self, **changes: Any) -> Set[str]:
+        """Update preferences in place, returning the names of the fields that changed"""
+        field_names = {f.name for f in fields(self)}
+        changed = set()
+        for name, value in changes.items():
+            if name not in field_names:
+                raise TypeError(f"Unknown preference: {name}")
+            if getattr(self, name) != value:
+                setattr(self, name, value)
+                changed.add(name)
+        return changed
+
     def save(self, config_path: Path):
         """Save user preferences to config file"""
         config_path.parent.mkdir(parents=True, exist_ok=True)
         
-        with open(config_path, 'w') as f:
-            json.dump(asdict(self), f, indent=2, default=str)
+        # Enums are written as their values and paths as strings, matching load
+        config_path.write_bytes(serialization.dumps(self, pretty=True))
 
     @classmethod
     def get_defaults(cls) -> 'UserPreferences':
@@ -0,0 +1,248 @@
+"""Tests for the AdaptiveModelSelector class implementation."""
+
+from datetime import datetime
+from time import time
+import gc
+import weakref
+import pytest
+from ravenxterm import serialization
+from ravenxterm.adaptive_selector import AdaptiveModelSelector, ModelUsageStats, ModelUsageTable, _flush_open_selectors
+from ravenxterm.model_registry import ModelMetadata, ModelType, HardwareType
+from ravenxterm.user_preferences import UserPreferences, AccuracyPreference
+
+def make_model(name, quantization=None):
+    """Create a minimal GGUF model for testing"""
+    return ModelMetadata(
+        name=name,
+        model_type=ModelType.GGUF,
+        size_bytes=1000000,
+        minimum_ram=2000000,
+        preferred_hardware=[HardwareType.CPU],
+        supports_batching=False,
+        quantization=quantization
+    )
+
+@pytest.fixture
+def selector(tmp_path):
+    """Create an AdaptiveModelSelector caching into a temporary directory"""
+    preferences = UserPreferences.get_defaults()
+    preferences.cache_dir = tmp_path / "cache"
+    return AdaptiveModelSelector(preferences)
+
+def test_default_score_for_new_models(selector):
+    """Test that models without history get the default score"""
+    assert selector.calculate_model_score(make_model("new_model"), "chat") == 0.5
+
+def test_model_score(selector):
+    """Test scoring of a model with recorded history"""
+    model = make_model("model")
+    selector.update_stats(model, {
+        "success": True,
+        "latency": 1.0,
+        "throughput": 500,
+        "memory_efficiency": 0.5
+    })
+
+    # BALANCED weights: 0.3 latency, 0.3 throughput, 0.2 memory, 0.2 success
+    expected = 0.5 * 0.3 + 0.5 * 0.3 + 0.5 * 0.2 + 1.0 * 0.2
+    assert selector.calculate_model_score(model, "chat") == pytest.approx(expected)
+
+def test_quantization_adjustment(selector):
+    """Test that accuracy preference adjusts scores of Q4 models"""
+    q4_model = make_model("q4_model", quantization="Q4_0")
+    q8_model = make_model("q8_model", quantization="Q8_0")
+    metrics = {"success": True, "latency": 1.0, "throughput": 500, "memory_efficiency": 0.5}
+    selector.update_stats(q4_model, metrics)
+    selector.update_stats(q8_model, metrics)
+
+    selector.preferences.accuracy_preference = AccuracyPreference.HIGH
+    selector.notify_preferences_changed({"accuracy_preference"})
+    high_q4 = selector.calculate_model_score(q4_model, "chat")
+    high_q8 = selector.calculate_model_score(q8_model, "chat")
+    assert high_q4 == pytest.approx(high_q8 * 0.8)
+
+    selector.preferences.accuracy_preference = AccuracyPreference.LOW
+    selector.notify_preferences_changed({"accuracy_preference"})
+    assert selector.calculate_model_score(q4_model, "chat") == pytest.approx(high_q8 * 1.2)
+
+def test_quantization_change_is_picked_up(selector):
+    """Test that a model re-registered with another quantization is scored by the new one"""
+    metrics = {"success": True, "latency": 1.0, "throughput": 500, "memory_efficiency": 0.5}
+    selector.update_stats(make_model("m0", quantization="Q4_0"), metrics)
+    selector.preferences.accuracy_preference = AccuracyPreference.HIGH
+    selector.notify_preferences_changed({"accuracy_preference"})
+    q4_score = selector.calculate_model_score(make_model("m0", quantization="Q4_0"), "chat")
+
+    q8_score = selector.calculate_model_score(make_model("m0", quantization="Q8_0"), "chat")
+
+    assert q4_score == pytest.approx(q8_score * 0.8)
+
+def test_recommended_models(selector):
+    """Test top-k recommendation ordering"""
+    models = [make_model(f"model_{i}") for i in range(10)]
+    for i, model in enumerate(models):
+        selector.update_stats(model, {
+            "success": True,
+            "latency": float(10 - i),
+            "throughput": 100 * i,
+            "memory_efficiency": 0.5
+        })
+
+    recommendations = selector.get_recommended_models(models, "chat", top_k=3)
+
+    assert [model.name for model, _ in recommendations] == ["model_9", "model_8", "model_7"]
+    scores = [score for _, score in recommendations]
+    assert scores == sorted(scores, reverse=True)
+
+def test_recommended_models_top_k_exceeds_candidates(selector):
+    """Test that asking for more models than available returns all of them"""
+    models = [make_model("a"), make_model("b")]
+    assert len(selector.get_recommended_models(models, "chat", top_k=5)) == 2
+    assert selector.get_recommended_models([], "chat") == []
+
+def test_recommended_models_ties_keep_input_order(selector):
+    """Test that equally scored models are returned in their input order"""
+    models = [make_model(f"model_{i}") for i in range(50)]
+    recommendations = selector.get_recommended_models(models, "chat", top_k=3)
+    assert [model.name for model, _ in recommendations] == ["model_0", "model_1", "model_2"]
+
+def test_stats_writes_are_deferred(selector):
+    """Test that stats are buffered in memory until flushed"""
+    stats_file = selector.stats_file
+    selector.update_stats(make_model("model"), {"success": True, "latency": 0.5})
+    assert not stats_file.exists()
+
+    selector.flush()
+    assert stats_file.exists()
+
+    reloaded = AdaptiveModelSelector(selector.preferences)
+    assert reloaded.usage_stats["model"].total_uses == 1
+
+def test_pending_stats_are_flushed_at_exit(selector):
+    """Test that the exit hook saves stats without keeping selectors alive"""
+    selector.update_stats(make_model("model"), {"success": True})
+    _flush_open_selectors()
+    assert selector.stats_file.exists()
+
+    other = AdaptiveModelSelector(selector.preferences)
+    ref = weakref.ref(other)
+    del other
+    gc.collect()
+    assert ref() is None
+
+def test_stats_log_is_compacted_on_load(selector):
+    """Test that replaying the stats log keeps the latest entry per model"""
+    model = make_model("model")
+    for latency in (1.0, 2.0, 3.0):
+        selector.update_stats(model, {"success": True, "latency": latency})
+        selector.flush()
+    assert len(selector.stats_file.read_text().splitlines()) == 3
+
+    reloaded = AdaptiveModelSelector(selector.preferences)
+    assert reloaded.usage_stats["model"].total_uses == 3
+    assert reloaded.usage_stats["model"].avg_latency == pytest.approx(2.0)
+    assert len(selector.stats_file.read_text().splitlines()) == 1
+
+def test_export_stats_reports_averages(selector):
+    """Test that exported stats hold derived averages and an ISO timestamp"""
+    model = make_model("model")
+    selector.update_stats(model, {"success": True, "latency": 1.0, "throughput": 100})
+    selector.update_stats(model, {"success": False, "latency": 3.0, "throughput": 300})
+
+    exported = serialization.loads(selector.export_stats(pretty=True))["model"]
+
+    assert exported["success_rate"] == pytest.approx(0.5)
+    assert exported["avg_latency"] == pytest.approx(2.0)
+    assert exported["avg_throughput"] == pytest.approx(200.0)
+    assert exported["total_uses"] == 2
+    assert datetime.fromisoformat(exported["last_used"])
+    assert "sum_latency" not in exported
+
+def test_truncated_stats_line_does_not_swallow_later_entries(selector):
+    """Test that an interrupted write is cleaned up before new stats are appended"""
+    selector.update_stats(make_model("model"), {"success": True, "latency": 1.0})
+    selector.flush()
+    log = selector.stats_file.read_bytes()
+    selector.stats_file.write_bytes(log + log[:len(log) // 2])  # Torn final line
+
+    reloaded = AdaptiveModelSelector(selector.preferences)
+    reloaded.update_stats(make_model("other"), {"success": True, "latency": 2.0})
+    reloaded.flush()
+
+    stats = AdaptiveModelSelector(selector.preferences).usage_stats
+    assert sorted(stats) == ["model", "other"]
+    assert stats["other"].avg_latency == 2.0
+
+def test_cache_size_tracks_stats_writes(selector):
+    """Test that the running cache size follows writes to the cache directory"""
+    assert selector.current_cache_size() == 0
+    selector.update_stats(make_model("model"), {"success": True})
+    selector.flush()
+    assert selector.current_cache_size() == selector.stats_file.stat().st_size
+
+def test_vectorized_scores_match_scalar_scores(selector):
+    """Test that large candidate lists are scored the same as single models"""
+    models = [make_model(f"model_{i}", quantization="Q4_0" if i % 2 else "Q8_0") for i in range(40)]
+    for i, model in enumerate(models[:30]):
+        selector.update_stats(model, {
+            "success": i % 3 == 0,
+            "latency": 0.1 * i,
+            "throughput": 37 * i,
+            "memory_efficiency": 0.01 * i
+        })
+    selector.preferences.accuracy_preference = AccuracyPreference.HIGH
+    selector.notify_preferences_changed({"accuracy_preference"})
+
+    recommendations = selector.get_recommended_models(models, "chat", top_k=len(models))
+    expected = sorted(
+        ((model, selector.calculate_model_score(model, "chat")) for model in models),
+        key=lambda x: x[1],
+        reverse=True
+    )
+    assert [model.name for model, _ in recommendations] == [model.name for model, _ in expected]
+    for (_, score), (_, expected_score) in zip(recommendations, expected):
+        assert score == pytest.approx(expected_score)
+
+def test_vectorized_scores_follow_direct_stats_writes(selector):
+    """Test that stats written through the mapping are seen by vectorized scoring"""
+    models = [make_model(f"model_{i}") for i in range(40)]
+    for model in models:
+        selector.update_stats(model, {"success": False, "latency": 1.0})
+    assert selector.get_recommended_models(models, "chat", top_k=1)[0][0].name == "model_0"
+
+    selector.usage_stats["model_5"] = ModelUsageStats(sum_success=10, sum_latency=1.0,
+                                                      sum_throughput=1000, total_uses=10)
+    assert selector.get_recommended_models(models, "chat", top_k=1)[0][0].name == "model_5"
+
+    del selector.usage_stats["model_5"]
+    selector.usage_stats["model_7"] = ModelUsageStats(sum_success=10, sum_latency=1.0,
+                                                      sum_throughput=1000, total_uses=10)
+    assert selector.get_recommended_models(models, "chat", top_k=1)[0][0].name == "model_7"
+
+def test_cleanup_cache_evicts_oldest_models(selector):
+    """Test that cleanup removes files of the least recently used models first"""
+    selector.preferences.auto_cleanup_threshold = 1000 / (1024 * 1024 * 1024)  # 1000 bytes
+    for name in ("old_model", "new_model"):
+        selector.update_stats(make_model(name), {"success": True})
+        (selector.cache_dir / f"{name}.bin").write_bytes(b"x" * 600)
+
+    selector.cleanup_cache()
+
+    assert not (selector.cache_dir / "old_model.bin").exists()
+    assert (selector.cache_dir / "new_model.bin").exists()
+    assert list(selector.usage_stats) == ["new_model"]
+    assert selector.stats_file.exists()
+
+def test_usage_table_delete_keeps_rows_aligned():
+    """Test that removing a model keeps the remaining models' stats intact"""
+    table = ModelUsageTable()
+    for i, name in enumerate(["a", "b", "c"]):
+        table.record(name, success=True, latency=float(i), throughput=0, memory_efficiency=0,
+                     when=time())
+
+    del table["a"]
+
+    assert sorted(table) == ["b", "c"]
+    assert table["b"].avg_latency == 1.0
+    assert table["c"].avg_latency == 2.0
+    assert "a" not in table
@@ -0,0 +1,117 @@
+"""Tests for the ModelManager class implementation."""
+
+from unittest.mock import patch
+import pytest
+from ravenxterm.model_manager import ModelManager
+from ravenxterm.model_registry import ModelMetadata, ModelType, HardwareType, HardwareProfile
+from ravenxterm.user_preferences import UserPreferences, AccuracyPreference
+
+GB = 1024 * 1024 * 1024
+
+@pytest.fixture
+def mock_hardware_profile():
+    """Create a mock hardware profile with one GPU"""
+    return HardwareProfile(
+        cpu_architecture="x86_64",
+        cpu_cores=8,
+        cpu_threads=16,
+        instruction_sets=["AVX2"],
+        available_memory=16 * GB,
+        gpu_devices={
+            "cuda:0": {
+                "name": "Test GPU",
+                "compute_capability": "8.0",
+                "total_memory": 24 * GB,
+                "multi_processor_count": 40
+            }
+        },
+        npu_devices={}
+    )
+
+@pytest.fixture
+def manager(tmp_path, mock_hardware_profile):
+    """Create a ModelManager whose config, models and cache live in a temporary directory"""
+    config_path = tmp_path / "config.json"
+    preferences = UserPreferences.get_defaults()
+    preferences.cache_dir = tmp_path / "cache"
+    preferences.save(config_path)
+    with patch('ravenxterm.model_registry.HardwareProfile.detect', return_value=mock_hardware_profile):
+        manager = ModelManager(models_dir=tmp_path / "models", config_path=config_path)
+    manager.registry.available_models = {
+        "gpu_model": ModelMetadata(
+            name="gpu_model",
+            model_type=ModelType.PYTORCH,
+            size_bytes=GB // 2,
+            minimum_ram=GB,
+            preferred_hardware=[HardwareType.CPU, HardwareType.CUDA],
+            supports_batching=True
+        ),
+        "huge_model": ModelMetadata(
+            name="huge_model",
+            model_type=ModelType.GGUF,
+            size_bytes=40 * GB,
+            minimum_ram=80 * GB,
+            preferred_hardware=[HardwareType.CPU],
+            supports_batching=False,
+            quantization="Q4_0"
+        )
+    }
+    return manager
+
+def test_recommendations_only_include_suitable_models(manager):
+    """Test that models needing more memory than available are not recommended"""
+    recommendations = manager.get_model_recommendations("chat", {})
+    assert [model.name for model, _, _ in recommendations] == ["gpu_model"]
+
+def test_batch_size_follows_free_gpu_memory(manager):
+    """Test that memoized recommendations still size batches from the current free memory"""
+    with patch("ravenxterm.model_registry._gpu_free_memory", return_value=20 * GB):
+        _, _, hardware_info = manager.get_model_recommendations("chat", {})[0]
+    assert hardware_info["preferred_device"] == "cuda:0"
+    assert hardware_info["recommended_batch_size"] == 7  # 70% of the 11.2GB allowed
+
+    with patch("ravenxterm.model_registry._gpu_free_memory", return_value=2 * GB):
+        _, _, hardware_info = manager.get_model_recommendations("chat", {})[0]
+    assert hardware_info["recommended_batch_size"] == 1
+
+def test_hardware_recommendations_are_copies(manager):
+    """Test that changing a returned recommendation doesn't affect later results"""
+    model = manager.registry.available_models["gpu_model"]
+    manager._get_hardware_recommendations(model)["warnings"].append("changed")
+    assert "changed" not in manager._get_hardware_recommendations(model)["warnings"]
+
+def test_expected_performance_follows_recorded_metrics(manager):
+    """Test that recording metrics refreshes the memoized expected performance"""
+    model = manager.registry.available_models["gpu_model"]
+    assert manager._get_hardware_recommendations(model)["expected_performance"] is None
+
+    manager.record_execution_metrics(model, {"success": True, "latency": 0.5, "throughput": 100})
+
+    expected = manager._get_hardware_recommendations(model)["expected_performance"]
+    assert expected["avg_latency_ms"] == pytest.approx(500)
+
+def test_update_preferences_is_shared_and_saved(manager):
+    """Test that preference updates reach the registry and selector and are saved"""
+    model = manager.registry.available_models["gpu_model"]
+    assert manager._get_hardware_recommendations(model)["preferred_device"] == "cuda:0"
+
+    manager.update_preferences(accuracy_preference="high", preferred_devices=["npu"])
+
+    assert manager.registry.preferences is manager.preferences
+    assert manager.selector.preferences is manager.preferences
+    assert manager.selector._q4_mul == (1.0, 0.8)
+    assert manager._get_hardware_recommendations(model)["preferred_device"] == "cpu"
+    saved = UserPreferences.load(manager.config_path)
+    assert saved.accuracy_preference == AccuracyPreference.HIGH
+    assert saved.preferred_devices == ["npu"]
+
+def test_model_selection_is_not_saved_until_metrics_are_recorded(manager):
+    """Test that recording a selection only buffers stats in memory"""
+    manager.selector._last_flush = float("-inf")  # Any persisting update would save now
+    model = manager.optimize_model_selection("chat", {})
+    assert model.name == "gpu_model"
+    assert manager.selector.usage_stats["gpu_model"].total_uses == 1
+    assert not manager.selector.stats_file.exists()
+
+    manager.record_execution_metrics(model, {"success": True, "latency": 0.5})
+    assert manager.selector.stats_file.exists()
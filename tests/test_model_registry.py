@@ -1,9 +1,14 @@
 """Tests for the ModelRegistry class implementation."""
 
+from dataclasses import FrozenInstanceError
 from pathlib import Path
+import struct
+import subprocess
+import sys
 import pytest
 import torch
 from unittest.mock import Mock, patch
+from ravenxterm import model_registry as model_registry_module
 from ravenxterm.model_registry import (
     ModelRegistry,
     ModelType,
@@ -11,6 +16,7 @@ from ravenxterm.model_registry import (
     ModelMetadata,
     HardwareProfile
 )
+from ravenxterm.user_preferences import UserPreferences
 
 @pytest.fixture
 def mock_hardware_profile():
@@ -37,9 +43,68 @@ def model_registry(tmp_path, mock_hardware_profile):
     """Create a ModelRegistry instance with a temporary directory"""
     with patch('ravenxterm.model_registry.HardwareProfile.detect') as mock_detect:
         mock_detect.return_value = mock_hardware_profile
-        registry = ModelRegistry(tmp_path)
+        preferences = UserPreferences.get_defaults()
+        preferences.cache_dir = tmp_path / "cache"
+        registry = ModelRegistry(tmp_path, preferences)
         return registry
 
+def test_import_does_not_load_torch():
+    """Test that importing the registry leaves torch unloaded until it is needed"""
+    code = "import sys, ravenxterm.model_registry; sys.exit('torch' in sys.modules)"
+    assert subprocess.run([sys.executable, "-c", code]).returncode == 0
+
+@pytest.fixture
+def hardware_cache(tmp_path, monkeypatch):
+    """Point the saved hardware profile at a temporary file"""
+    cache_path = tmp_path / "hardware.json"
+    monkeypatch.setattr(model_registry_module, "HARDWARE_CACHE_PATH", cache_path)
+    model_registry_module._detect_cached.cache_clear()
+    yield cache_path
+    model_registry_module._detect_cached.cache_clear()
+
+def test_hardware_profile_is_saved_and_reused(hardware_cache, mock_hardware_profile):
+    """Test that a saved hardware profile is loaded instead of probing again"""
+    with patch.object(HardwareProfile, "_probe", return_value=mock_hardware_profile) as probe:
+        assert HardwareProfile.detect() == mock_hardware_profile
+        assert hardware_cache.exists()
+
+        model_registry_module._detect_cached.cache_clear()
+        profile = HardwareProfile.detect()
+
+    probe.assert_called_once()
+    assert profile == mock_hardware_profile
+    assert profile._available_hw_mask == mock_hardware_profile._available_hw_mask
+
+@pytest.mark.parametrize("contents", [
+    b'{"key": "another machine", "profile": {}}',
+    b'{not json',
+])
+def test_stale_or_unreadable_hardware_profile_is_probed(hardware_cache, mock_hardware_profile, contents):
+    """Test that a saved profile for other hardware, or a corrupt one, is detected again"""
+    hardware_cache.write_bytes(contents)
+    with patch.object(HardwareProfile, "_probe", return_value=mock_hardware_profile) as probe:
+        assert HardwareProfile.detect() == mock_hardware_profile
+    probe.assert_called_once()
+
+def test_hardware_profile_is_probed_when_gpus_change(hardware_cache, mock_hardware_profile,
+                                                    monkeypatch, tmp_path):
+    """Test that a GPU or driver appearing invalidates the saved profile"""
+    nvidia_dir = tmp_path / "nvidia"
+    monkeypatch.setattr(model_registry_module, "NVIDIA_PROC_DIR", nvidia_dir)
+    monkeypatch.setattr(model_registry_module, "DEVICE_DIR", tmp_path / "dev")
+    with patch.object(HardwareProfile, "_probe", return_value=mock_hardware_profile) as probe:
+        HardwareProfile.detect()
+
+        (nvidia_dir / "gpus" / "0000:01:00.0").mkdir(parents=True)
+        (nvidia_dir / "version").write_text("NVRM version: NVIDIA UNIX x86_64 Kernel Module  550.54\n")
+        model_registry_module._detect_cached.cache_clear()
+        HardwareProfile.detect()
+
+        model_registry_module._detect_cached.cache_clear()
+        HardwareProfile.detect()
+
+    assert probe.call_count == 2
+
 def test_model_registry_initialization(model_registry, tmp_path):
     """Test ModelRegistry initialization"""
     assert model_registry.models_dir == tmp_path
@@ -47,6 +112,61 @@ def test_model_registry_initialization(model_registry, tmp_path):
     assert model_registry.available_models == {}
     assert model_registry.performance_history == {}
 
+def test_scan_models_directory(model_registry, tmp_path):
+    """Test that scanning registers model files in nested directories"""
+    (tmp_path / "nested").mkdir()
+    (tmp_path / "nested" / "chat-q5_1.gguf").write_bytes(b"x" * 10)
+    (tmp_path / "vision.pt").write_bytes(b"not a checkpoint")
+    (tmp_path / "notes.txt").touch()
+
+    model_registry._index_available_models()
+    assert model_registry._available_models == {}  # Registered on first access
+
+    assert list(model_registry.available_models) == ["chat-q5_1"]
+    model = model_registry.available_models["chat-q5_1"]
+    assert model.size_bytes == 10
+    assert model.quantization == "Q5_1"
+
+def test_scan_registers_many_models_in_parallel(model_registry, tmp_path):
+    """Test that large directories register every model through the thread pool"""
+    for i in range(20):
+        (tmp_path / f"model_{i:02d}-q4_0.gguf").write_bytes(b"x" * i)
+
+    model_registry._index_available_models()
+
+    assert sorted(model_registry.available_models) == [f"model_{i:02d}-q4_0" for i in range(20)]
+    assert model_registry.available_models["model_07-q4_0"].size_bytes == 7
+
+def test_scan_reuses_cached_metadata(model_registry, tmp_path):
+    """Test that unchanged model files are not parsed again on the next scan"""
+    model_path = tmp_path / "chat-q5_1.gguf"
+    model_path.write_bytes(b"x" * 10)
+    model_registry._index_available_models()
+    assert "chat-q5_1" in model_registry.available_models
+
+    with patch.object(ModelRegistry, '_build_gguf_metadata') as build:
+        model_registry._index_available_models()
+        assert model_registry.available_models["chat-q5_1"].quantization == "Q5_1"
+        build.assert_not_called()
+
+    model_path.write_bytes(b"x" * 20)  # Changed files are parsed again
+    model_registry._index_available_models()
+    assert model_registry.available_models["chat-q5_1"].size_bytes == 20
+
+def test_cached_pytorch_models_follow_current_cuda_support(model_registry, tmp_path):
+    """Test that cached PyTorch models don't keep CUDA once it is no longer available"""
+    torch.save({"config": {}}, tmp_path / "net.pt")
+    with patch("ravenxterm.model_registry._cuda_available", return_value=True):
+        model_registry._index_available_models()
+        assert HardwareType.CUDA in model_registry.available_models["net"].preferred_hardware
+
+    with patch("ravenxterm.model_registry._cuda_available", return_value=False), \
+            patch.object(ModelRegistry, "_build_pytorch_metadata") as build:
+        model_registry._index_available_models()
+        assert model_registry.available_models["net"].preferred_hardware == [HardwareType.CPU]
+        assert model_registry.get_suitable_models({"required_hardware": [HardwareType.CUDA]}) == []
+        build.assert_not_called()
+
 def test_register_gguf_model(model_registry, tmp_path):
     """Test GGUF model registration"""
     # Create a mock GGUF file
@@ -59,15 +179,69 @@ def test_register_gguf_model(model_registry, tmp_path):
     model = model_registry.available_models["test-q4_0"]
     assert model.model_type == ModelType.GGUF
     assert model.quantization == "Q4_0"
+    assert model.quantization_level == 4
     assert model.preferred_hardware == [HardwareType.CPU]
 
+@pytest.mark.parametrize("filename, expected", [
+    ("test-q4_0.gguf", ("Q4_0", 4)),
+    ("Llama-3-8B-Instruct.Q5_K_M.gguf", ("Q5_K_M", 5)),
+    ("model-q8_0.gguf", ("Q8_0", 8)),
+    ("plain.gguf", (None, None)),
+])
+def test_detect_gguf_quantization(model_registry, tmp_path, filename, expected):
+    """Test GGUF quantization detection from filenames"""
+    assert model_registry._detect_gguf_quantization(tmp_path / filename) == expected
+
+@pytest.mark.parametrize("quantization, level", [
+    ("Q4_0", 4),
+    ("Q5_K_M", 5),
+    ("q8_0", 8),
+    ("F16", None),
+    ("fp16", None),
+    ("none", None),
+])
+def test_quantization_level_from_tag(quantization, level):
+    """Test that only Q<bits> quantization tags get a quantization level"""
+    model = ModelMetadata(
+        name="model",
+        model_type=ModelType.PYTORCH,
+        size_bytes=1000,
+        minimum_ram=2000,
+        preferred_hardware=[HardwareType.CPU],
+        supports_batching=False,
+        quantization=quantization
+    )
+    assert model.quantization_level == level
+
+def write_gguf_header(path, file_type):
+    """Write a GGUF header with a few metadata entries and no tensors"""
+    def string(value):
+        return struct.pack('<Q', len(value)) + value
+
+    kvs = [
+        string(b"general.architecture") + struct.pack('<I', 8) + string(b"llama"),
+        string(b"llama.context_lengths") + struct.pack('<IIQ', 9, 4, 2) + struct.pack('<II', 2048, 4096),
+        string(b"general.file_type") + struct.pack('<II', 4, file_type),
+    ]
+    path.write_bytes(b"GGUF" + struct.pack('<IQQ', 3, 0, len(kvs)) + b"".join(kvs))
+
+def test_detect_gguf_quantization_from_header(model_registry, tmp_path):
+    """Test that the GGUF header takes precedence over the filename"""
+    model_path = tmp_path / "renamed-q8_0.gguf"
+    write_gguf_header(model_path, 15)
+    assert model_registry._detect_gguf_quantization(model_path) == ("Q4_K_M", 4)
+
+    write_gguf_header(model_path, 99)  # Unknown file type falls back to the filename
+    assert model_registry._detect_gguf_quantization(model_path) == ("Q8_0", 8)
+
 def test_register_pytorch_model(model_registry, tmp_path):
     """Test PyTorch model registration"""
     # Create a mock PyTorch model file
     model_path = tmp_path / "test_model.pt"
     torch.save({"config": {}}, model_path)
     
-    model_registry._register_pytorch_model(model_path)
+    with patch("ravenxterm.model_registry._cuda_available", return_value=True):
+        model_registry._register_pytorch_model(model_path)
     
     assert "test_model" in model_registry.available_models
     model = model_registry.available_models["test_model"]
@@ -132,6 +306,37 @@ def test_hardware_recommendations(model_registry):
     assert recommendations["recommended_batch_size"] is not None
     assert len(recommendations["warnings"]) == 0
 
+def test_hardware_recommendations_use_current_free_memory(model_registry):
+    """Test that GPU batch sizes follow the free memory at the time of the call"""
+    model = ModelMetadata(
+        name="test_model",
+        model_type=ModelType.PYTORCH,
+        size_bytes=1000000000,
+        minimum_ram=1000000000,
+        preferred_hardware=[HardwareType.CPU, HardwareType.CUDA],
+        supports_batching=True
+    )
+    with patch("ravenxterm.model_registry._gpu_free_memory", return_value=2000000000) as free_memory:
+        recommendations = model_registry.get_hardware_recommendations(model)
+
+    free_memory.assert_called_once_with("cuda:0", model_registry.hardware_profile.gpu_devices["cuda:0"])
+    assert recommendations["recommended_batch_size"] == 1  # 70% of 2GB fits one copy
+
+def test_model_hardware_mask():
+    """Test that preferred hardware is folded into a bitmask"""
+    model = ModelMetadata(
+        name="test_model",
+        model_type=ModelType.PYTORCH,
+        size_bytes=1000000,
+        minimum_ram=2000000,
+        preferred_hardware=[HardwareType.CPU, HardwareType.CUDA],
+        supports_batching=True
+    )
+    assert model._hw_mask == 0b0011
+
+    with pytest.raises(FrozenInstanceError):
+        model.size_bytes = 0
+
 def test_performance_recording(model_registry):
     """Test performance metrics recording"""
     metrics = {
@@ -143,6 +348,25 @@ def test_performance_recording(model_registry):
     assert "test_model" in model_registry.performance_history
     assert model_registry.performance_history["test_model"][0] == metrics
 
+def test_performance_history_window(model_registry):
+    """Test that history is trimmed to the configured size and averages follow it"""
+    model_registry.preferences.model_usage_history_size = 2
+    for latency in (1.0, 2.0, 3.0):
+        model_registry.record_performance("test_model", {"latency": latency, "throughput": 10 * latency})
+
+    assert [m["latency"] for m in model_registry.performance_history["test_model"]] == [2.0, 3.0]
+    assert model_registry.avg_latency("test_model") == pytest.approx(2.5)
+    assert model_registry.avg_throughput("test_model") == pytest.approx(25.0)
+    assert model_registry.avg_latency("unknown_model") == 0.0
+
+def test_performance_history_disabled(model_registry):
+    """Test that a history size of 0 records nothing"""
+    model_registry.preferences.model_usage_history_size = 0
+    model_registry.record_performance("test_model", {"latency": 1.0, "throughput": 10})
+
+    assert len(model_registry.performance_history["test_model"]) == 0
+    assert model_registry.avg_latency("test_model") == 0.0
+
 def test_model_ranking(model_registry):
     """Test model ranking based on performance and hardware"""
     models = [
@@ -173,3 +397,72 @@ def test_model_ranking(model_registry):
     ranked_models = model_registry._rank_models(models, requirements)
     
     assert ranked_models[0].name == "fast_model"  # Should be ranked higher due to better performance
+
+def test_model_ranking_custom_weights(model_registry):
+    """Test that custom model weights scale ranking scores"""
+    models = [
+        ModelMetadata(
+            name=name,
+            model_type=ModelType.GGUF,
+            size_bytes=1000000,
+            minimum_ram=2000000,
+            preferred_hardware=[HardwareType.CPU],
+            supports_batching=False
+        )
+        for name in ("fast_model", "slow_model")
+    ]
+    model_registry.record_performance("fast_model", {"latency": 0.1, "throughput": 1000})
+    model_registry.record_performance("fast_model", {"latency": 0.3, "throughput": 600})
+    model_registry.record_performance("slow_model", {"latency": 0.5, "throughput": 500})
+    assert model_registry.avg_latency("fast_model") == pytest.approx(0.2)
+
+    model_registry.preferences.custom_model_weights = {"slow_model": 2.0}
+    ranked_models = model_registry._rank_models(models, {})
+
+    assert [model.name for model in ranked_models] == ["slow_model", "fast_model"]
+
+def test_suitable_models_match_requirement_checks(model_registry):
+    """Test that vectorized filtering agrees with per-model requirement checks"""
+    model_registry.available_models = {
+        f"model_{i}": ModelMetadata(
+            name=f"model_{i}",
+            model_type=ModelType.GGUF,
+            size_bytes=(i + 1) * 1000000,
+            minimum_ram=(i + 1) * 2000000,
+            preferred_hardware=[HardwareType.CPU, HardwareType.CUDA] if i % 2 else [HardwareType.CPU],
+            supports_batching=i % 3 == 0,
+            quantization=[None, "Q4_0", "Q5_1", "Q8_0"][i % 4]
+        )
+        for i in range(12)
+    }
+
+    for requirements in [
+        {},
+        {"max_size_bytes": 6000000},
+        {"required_hardware": [HardwareType.CUDA], "requires_batching": True},
+        {"max_quantization": 5},
+    ]:
+        expected = [
+            model for model in model_registry.available_models.values()
+            if model_registry._meets_requirements(model, requirements)
+        ]
+        assert model_registry.get_suitable_models(requirements) == expected
+
+def test_available_models_is_read_only(model_registry):
+    """Test that registered models can only be replaced through the setter"""
+    model = ModelMetadata(
+        name="model",
+        model_type=ModelType.GGUF,
+        size_bytes=1000,
+        minimum_ram=2000,
+        preferred_hardware=[HardwareType.CPU],
+        supports_batching=False
+    )
+    model_registry.available_models = {}
+    assert model_registry.get_suitable_models({}) == []
+
+    with pytest.raises(TypeError):
+        model_registry.available_models["model"] = model
+
+    model_registry.available_models = {"model": model}
+    assert model_registry.get_suitable_models({}) == [model]
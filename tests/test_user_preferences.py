@@ -0,0 +1,31 @@
+"""Tests for the UserPreferences class implementation."""
+
+from ravenxterm.user_preferences import UserPreferences, PerformancePreference, AccuracyPreference
+
+def test_save_and_load_round_trip(tmp_path):
+    """Test that saved preferences load back unchanged"""
+    config_path = tmp_path / "config" / "preferences.json"
+    preferences = UserPreferences.get_defaults()
+    preferences.performance_mode = PerformancePreference.SPEED
+    preferences.accuracy_preference = AccuracyPreference.HIGH
+    preferences.cache_dir = tmp_path / "cache"
+    preferences.custom_model_weights = {"model": 1.5}
+
+    preferences.save(config_path)
+
+    assert UserPreferences.load(config_path) == preferences
+
+def test_load_missing_or_invalid_config(tmp_path):
+    """Test that missing or unreadable configs fall back to the defaults"""
+    config_path = tmp_path / "preferences.json"
+    assert UserPreferences.load(config_path) == UserPreferences.get_defaults()
+
+    config_path.write_text("{not json")
+    assert UserPreferences.load(config_path) == UserPreferences.get_defaults()
+
+def test_reconfigure_reports_changed_fields():
+    """Test that reconfigure only reports fields whose value changed"""
+    preferences = UserPreferences.get_defaults()
+    changed = preferences.reconfigure(max_memory_usage=0.5, preferred_devices=["cpu"])
+    assert changed == {"max_memory_usage"}
+    assert preferences.max_memory_usage == 0.5